@@ -1,14 +1,18 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import pickle
 from datetime import datetime
-import plotly.graph_objects as go
-import plotly.express as px
 
 
-from src.feature_eng import get_feature_columns,engineer_features
+from src.booking import BookingRecord
+from src.feature_eng import engineer_feature_matrix
 from src.suggest import get_suggestions
+from src.scoring import LOW_RISK_THRESHOLD, RISK_TIERS, risk_tier_codes
+from src.cache import PredictionCache, booking_key
+from src.registry import ModelHandle, RegistryError
+from src.drift import DriftMonitor
+from src.explain import describe_factors, profile_contributions, score_and_contributions, top_factors
+from src import metrics
 
 
 # Page configuration
@@ -23,22 +27,43 @@ st.set_page_config(
 def load_css(path):
     with open(path) as f:
         st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-load_css("assets/style.css")
+with metrics.timer('load_css'):
+    load_css("assets/style.css")
 
-# Load models and preprocessors
+# Load models and preprocessors; the handle swaps in new registry versions from a background thread
 @st.cache_resource
-def load_model_and_scaler():
+def load_model_handle():
     try:
-        with open('model/best_model.pkl', 'rb') as f:
-            model = pickle.load(f)
-        with open('model/scaler.pkl', 'rb') as f:
-            scaler = pickle.load(f)
-        return model, scaler
-    except FileNotFoundError:
+        return ModelHandle(compiled=True).watch()
+    except (FileNotFoundError, RegistryError):
         st.error("⚠️ Model files not found! Please ensure 'best_model.pkl' and 'scaler.pkl' are in the same directory.")
-        return None, None
+        return None
+
+model_handle = load_model_handle()
+
+# One prediction cache shared by every session
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache()
 
-model, scaler = load_model_and_scaler()
+prediction_cache = get_prediction_cache()
+
+# Feature drift of scored bookings against the training data, shared by every session
+@st.cache_resource
+def get_drift_monitor():
+    try:
+        return DriftMonitor()
+    except FileNotFoundError:
+        return None
+
+drift_monitor = get_drift_monitor()
+
+# Follow-up actions are persisted here and processed by `python -m src.jobs work`
+@st.cache_resource
+def get_job_queue():
+    from src.jobs import JobQueue
+
+    return JobQueue()
 
 # Main App
 def main():
@@ -60,9 +85,11 @@ def main():
         """,
         unsafe_allow_html=True
     )
-    if model is None or scaler is None:
+    if model_handle is None:
         st.error("Cannot proceed without model files. Please check the error message above.")
         return
+    # One version for the whole run, even if the watcher swaps models meanwhile
+    active = model_handle.get()
     
     # Sidebar info
     st.sidebar.title("ℹ️ System Information")
@@ -81,7 +108,16 @@ def main():
     
     st.sidebar.markdown("---")
     st.sidebar.success("✅ Model: Loaded & Ready")
+    st.sidebar.caption(f"Model version: {active.version}")
+    if model_handle.events:
+        event = model_handle.events[-1]
+        st.sidebar.caption(f"Last reload: {event['version']} {event['outcome'].replace('_', ' ')} at {event['time']}")
     st.sidebar.metric("Model Type", "Binary Classifier")
+
+    mode = st.sidebar.radio("Mode", ["Single Booking", "Portfolio Dashboard"])
+    if mode == "Portfolio Dashboard":
+        render_dashboard(active)
+        return
     
     # Main input section
     st.markdown("## 📝 Enter Booking Details")
@@ -115,195 +151,331 @@ def main():
         route = st.text_input("Route (e.g., LHR-JFK)", value="LHR-JFK")
         booking_origin = st.text_input("Booking Origin Country", value="UK")
     
+    # Validated booking record; derived fields such as total_extras are computed once here
+    try:
+        booking = BookingRecord(
+            num_passengers=num_passengers,
+            sales_channel=sales_channel,
+            trip_type=trip_type,
+            purchase_lead=purchase_lead,
+            length_of_stay=length_of_stay,
+            flight_hour=flight_hour,
+            flight_day=flight_day_num,
+            route=route,
+            wants_extra_baggage=wants_extra_baggage,
+            wants_preferred_seat=wants_preferred_seat,
+            wants_in_flight_meals=wants_in_flight_meals,
+            flight_duration=flight_duration,
+            booking_origin=booking_origin,
+        )
+    except ValueError as exc:
+        st.error(f"⚠️ {exc}")
+        return
+    input_key = booking_key(booking)
+
     # Predict button
     st.markdown("---")
     if st.button("🔮 Predict Booking Status", use_container_width=True, type="primary"):
-        # Prepare input data
-        input_data = {
-            'num_passengers': num_passengers,
-            'sales_channel': sales_channel,
-            'trip_type': trip_type,
-            'purchase_lead': purchase_lead,
-            'length_of_stay': length_of_stay,
-            'flight_hour': flight_hour,
-            'flight_day': flight_day_num,
-            'route': route,
-            'booking_origin': booking_origin,
-            'wants_extra_baggage': int(wants_extra_baggage),
-            'wants_preferred_seat': int(wants_preferred_seat),
-            'wants_in_flight_meals': int(wants_in_flight_meals),
-            'flight_duration': flight_duration,
-            'total_extras': int(wants_extra_baggage) + int(wants_preferred_seat) + int(wants_in_flight_meals),
-            'inconvenient_flight_time': int(flight_hour < 6 or flight_hour >= 22)
-        }
-        
-        # Create DataFrame
-        input_df = pd.DataFrame([input_data])
-        
-        # Engineer features
-        featured_df = engineer_features(input_df)
-        
-        # Get prediction features in correct order
-        feature_cols = get_feature_columns()
-        X_pred = featured_df[feature_cols]
-        
-        # Scale features if using Logistic Regression
-        try:
-            X_pred_scaled = scaler.transform(X_pred)
-            X_final = X_pred_scaled
-        except:
-            X_final = X_pred
-        
-        # Make prediction
-        prediction = model.predict(X_final)[0]
-        probability = model.predict_proba(X_final)[0][1]  # Probability of class 1 (completion)
-        
-        # Adjust probability based on prediction
-        if prediction == 0:
-            confidence_score = 1 - probability  # Confidence in "will not complete"
-        else:
-            confidence_score = probability  # Confidence in "will complete"
-        
-        # Display results
-        st.markdown("---")
-        st.markdown("## 🎯 Prediction Results")
-        
-        # Top section with prediction and key metrics
-        result_col1, result_col2 = st.columns([2, 1])
-        
-        with result_col1:
-           
-            st.markdown("### 💡 Actionable Suggestions")
-            
-            # Get suggestions
-            suggestions = get_suggestions(prediction, confidence_score, input_data)
-            
-            # Display suggestions
-            for suggestion in suggestions:
-                risk_class = suggestion.get('class', 'low-risk')
-                title = suggestion.get('title', '')
-                description = suggestion.get('description', '')
-                priority = suggestion.get('priority', '')
-                
-                if priority:
-                    st.markdown(f"""
-                        <div class="suggestion-box {risk_class}">
-                            <h4 style="margin: 0 0 0.5rem 0;">{title}</h4>
-                            <p style="margin: 0; font-weight: bold;">Priority: {priority}</p>
-                        </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                        <div class="suggestion-box {risk_class}">
-                            <h4 style="margin: 0 0 0.5rem 0;">{title}</h4>
-                            <p style="margin: 0; font-size: 0.9rem;">{description}</p>
-                        </div>
-                    """, unsafe_allow_html=True)
-        
-        with result_col2:
-            st.markdown("### 📊 Classification Result")
-            
-            # Main prediction box
-            if prediction == 1:
-                box_class = "will-complete"
-                emoji = "✅"
-                result = "WILL COMPLETE"
-                message = "Customer likely to complete booking"
+        # Repeat inputs are served from the cache without rebuilding features
+        result, hit = prediction_cache.get_or_compute((active.version, input_key),
+                                                      lambda: predict_booking(active, booking))
+        metrics.count('prediction_cache_lookups', result='hit' if hit else 'miss')
+        # Counted per prediction shown, so cache hits reach the risk tier counter too
+        metrics.count_risk_tiers([result['risk_tier_code']], RISK_TIERS)
+        st.session_state['prediction'] = result
+        # Actions target this session's booking, never the shared cache entry; a new booking gets a new reference
+        if st.session_state.get('booking_ref_key') != (input_key, booking.booking_origin):
+            from src.jobs import new_booking_id
+
+            st.session_state['booking_ref_key'] = (input_key, booking.booking_origin)
+            st.session_state['booking_ref'] = new_booking_id()
+        st.session_state['booking'] = booking
+
+    # The last result lives in session state, so reruns from other widgets keep it on screen
+    result = st.session_state.get('prediction')
+    if result is not None:
+        if result['key'] != input_key:
+            st.info("ℹ️ Booking details changed since this prediction. Click \"Predict Booking Status\" to update.")
+        render_prediction(result, st.session_state['booking'], st.session_state['booking_ref'])
+
+    # Live latency panel (rendered last so it includes this run's prediction)
+    if metrics.ENABLED:
+        with st.sidebar.expander("⏱️ Stage Latency", expanded=False):
+            latency = metrics.REGISTRY.summary()
+            if latency:
+                st.dataframe(pd.DataFrame(latency).round(2), use_container_width=True, hide_index=True)
             else:
-                box_class = "will-not-complete"
-                emoji = "❌"
-                result = "WILL NOT COMPLETE"
-                message = "Customer likely to abandon booking"
-            
-            st.markdown(f"""
-                <div class="prediction-box {box_class}">
-                    <h1 style="font-size: 3rem; margin: 0;">{emoji}</h1>
-                    <h2 style="margin: 0.5rem 0;">{result}</h2>
-                    <p style="margin: 0; font-size: 1.1rem;">{message}</p>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            st.markdown("### 📈 Key Metrics")
-            st.metric("Model Confidence", f"{confidence_score*100:.1f}%")
-            st.metric("Risk Level", 
-                     "🔴 HIGH" if prediction == 0 else "🟡 MEDIUM" if confidence_score < 0.7 else "🟢 LOW")
-            st.metric("Follow-up Priority", 
-                     "URGENT" if prediction == 0 else "STANDARD")
-        
-        # Detailed analysis section
-        st.markdown("---")
-        st.markdown("## 📊 Detailed Analysis")
-        
-        analysis_col1, analysis_col2 = st.columns([2, 1])
-        
-        with analysis_col1:
-            st.markdown("### 🔍 Booking Profile Analysis")
-            
-            # Create analysis dataframe
-            profile_data = {
-                'Category': ['Customer Type', 'Booking Behavior', 'Service Preference', 'Trip Type'],
-                'Classification': [
-                    '👤 Solo' if num_passengers == 1 else '👥 Couple' if num_passengers == 2 else '👨‍👩‍👧‍👦 Group',
-                    '🏃 Last Minute' if purchase_lead < 7 else '📅 Short Term' if purchase_lead < 30 else '📆 Well Planned',
-                    '💎 Premium' if input_data['total_extras'] == 3 else '⭐ Standard' if input_data['total_extras'] > 0 else '💰 Budget',
-                    '🔄 Round Trip' if trip_type == 'RoundTrip' else '➡️ One Way' if trip_type == 'OneWay' else '🔁 Circle Trip'
-                ],
-                'Risk Factor': [
-                    'Low' if num_passengers <= 2 else 'Medium',
-                    'High' if purchase_lead < 7 else 'Medium' if purchase_lead < 30 else 'Low',
-                    'Low' if input_data['total_extras'] >= 2 else 'High',
-                    'Low' if trip_type == 'RoundTrip' else 'Medium'
-                ]
-            }
-            
-            profile_df = pd.DataFrame(profile_data)
-            st.dataframe(profile_df, use_container_width=True, hide_index=True)
-            
-            
-        with analysis_col2:
-            # Additional factors
-            st.markdown("### 📌 Key Factors Identified")
-            factor_cols = st.columns(3)
-            
-            with factor_cols[0]:
-                if purchase_lead < 7:
-                    st.error("⚠️ Last-minute booking")
-                if input_data['total_extras'] == 0:
-                    st.warning("💰 No add-ons selected")
-            
-            with factor_cols[1]:
-                if num_passengers >= 3:
-                    st.info("👨‍👩‍👧‍👦 Group travel")
-                if flight_duration > 6:
-                    st.info("✈️ Long-haul flight")
-            
-            with factor_cols[2]:
-                if sales_channel == 'Mobile':
-                    st.info("📱 Mobile booking")
-                if length_of_stay > 14:
-                    st.info("🏨 Extended stay")
-        
-        # Action buttons section
-        st.markdown("---")
-        st.markdown("## 🎯 Recommended Actions")
-        
-        action_col1, action_col2, action_col3 = st.columns(3)
-        
-        with action_col1:
-            if st.button("📧 Send Follow-up Email", use_container_width=True):
-                st.success("✅ Follow-up email queued for delivery")
-        
-        with action_col2:
-            if st.button("📞 Schedule Support Call", use_container_width=True):
-                st.success("✅ Support call scheduled with next available agent")
-        
-        with action_col3:
-            if prediction == 0:
-                if st.button("🎁 Generate Incentive Code", use_container_width=True):
-                    st.success("✅ 10% discount code: BA2024SAVE10")
+                st.caption("No predictions timed yet")
+
+    with st.sidebar.expander("🗃️ Prediction Cache", expanded=False):
+        stats = prediction_cache.stats()
+        st.metric("Hit Rate", f"{stats['hit_rate'] * 100:.1f}%")
+        st.caption(f"{stats['hits']} hits · {stats['misses']} misses · {stats['size']}/{stats['maxsize']} entries · "
+                   f"{stats['expired']} expired · {stats['evictions']} evicted")
+
+    if drift_monitor is not None:
+        with st.sidebar.expander("📉 Feature Drift", expanded=False):
+            report = drift_monitor.report()
+            if report['rows'] < drift_monitor.min_rows:
+                st.caption(f"{report['rows']} of {drift_monitor.min_rows} bookings needed before drift is assessed")
+            drift = pd.DataFrame(report['features'][:5]).rename(columns=str.title)
+            st.dataframe(drift.round(3), use_container_width=True, hide_index=True)
+
+
+def predict_booking(active, booking):
+    """Score one booking with a model version and build everything the results section renders"""
+    # Engineer features straight from the record, in get_feature_columns() order
+    X_pred = engineer_feature_matrix(booking.to_array(), route_stats=active.route_stats)
+
+    # Prediction and the model-based contribution of every feature to this booking's log-odds of
+    # completion, from one pass over the model (scaling is applied only for Logistic Regression)
+    predictions, probabilities, confidences, contributions = score_and_contributions(active.model, active.scaler,
+                                                                                     X_pred)
+    if drift_monitor is not None:
+        drift_monitor.update(X_pred)
+
+    factor_ids, factor_values = top_factors(contributions)
+    profile_impact = profile_contributions(contributions[0])
+    prediction = int(predictions[0])
+    probability = float(probabilities[0])  # Probability of class 1 (completion)
+    confidence_score = float(confidences[0])  # Confidence in the predicted class
+
+    num_passengers = booking.num_passengers
+    purchase_lead = booking.purchase_lead
+    trip_type = booking.trip_type
+
+    # Create analysis dataframe
+    profile_data = {
+        'Category': ['Customer Type', 'Booking Behavior', 'Service Preference', 'Trip Type'],
+        'Classification': [
+            '👤 Solo' if num_passengers == 1 else '👥 Couple' if num_passengers == 2 else '👨‍👩‍👧‍👦 Group',
+            '🏃 Last Minute' if purchase_lead < 7 else '📅 Short Term' if purchase_lead < 30 else '📆 Well Planned',
+            '💎 Premium' if booking.total_extras == 3 else '⭐ Standard' if booking.total_extras > 0 else '💰 Budget',
+            '🔄 Round Trip' if trip_type == 'RoundTrip' else '➡️ One Way' if trip_type == 'OneWay' else '🔁 Circle Trip'
+        ],
+        'Risk Factor': [
+            'Low' if num_passengers <= 2 else 'Medium',
+            'High' if purchase_lead < 7 else 'Medium' if purchase_lead < 30 else 'Low',
+            'Low' if booking.total_extras >= 2 else 'High',
+            'Low' if trip_type == 'RoundTrip' else 'Medium'
+        ],
+        'Model Impact': [f"{'▲' if impact > 0 else '▼'} {impact:+.2f}" for impact in profile_impact.values()]
+    }
+
+    return {
+        'key': booking_key(booking),
+        'version': active.version,
+        'prediction': prediction,
+        'probability': probability,
+        'confidence': confidence_score,
+        'risk_tier_code': int(risk_tier_codes(predictions, confidences)[0]),
+        'suggestions': get_suggestions(prediction, confidence_score, booking),
+        'profile': pd.DataFrame(profile_data),
+        'factors': describe_factors(factor_ids[0], factor_values[0], X_pred[0]),
+    }
+
+
+def render_prediction(result, booking, booking_ref):
+    """Results, suggestions and analysis for a (possibly cached) prediction"""
+    prediction = result['prediction']
+    confidence_score = result['confidence']
+
+    # Display results
+    st.markdown("---")
+    st.markdown("## 🎯 Prediction Results")
+
+    # Top section with prediction and key metrics
+    result_col1, result_col2 = st.columns([2, 1])
+
+    with result_col1:
+
+        st.markdown("### 💡 Actionable Suggestions")
+
+        # Display suggestions
+        for suggestion in result['suggestions']:
+            risk_class = suggestion.get('class', 'low-risk')
+            title = suggestion.get('title', '')
+            description = suggestion.get('description', '')
+            priority = suggestion.get('priority', '')
+
+            if priority:
+                st.markdown(f"""
+                    <div class="suggestion-box {risk_class}">
+                        <h4 style="margin: 0 0 0.5rem 0;">{title}</h4>
+                        <p style="margin: 0; font-weight: bold;">Priority: {priority}</p>
+                    </div>
+                """, unsafe_allow_html=True)
             else:
-                if st.button("📋 Add to Follow-up List", use_container_width=True):
-                    st.success("✅ Added to standard follow-up queue")
+                st.markdown(f"""
+                    <div class="suggestion-box {risk_class}">
+                        <h4 style="margin: 0 0 0.5rem 0;">{title}</h4>
+                        <p style="margin: 0; font-size: 0.9rem;">{description}</p>
+                    </div>
+                """, unsafe_allow_html=True)
+
+    with result_col2:
+        st.markdown("### 📊 Classification Result")
+
+        # Main prediction box
+        if prediction == 1:
+            box_class = "will-complete"
+            emoji = "✅"
+            result_text = "WILL COMPLETE"
+            message = "Customer likely to complete booking"
+        else:
+            box_class = "will-not-complete"
+            emoji = "❌"
+            result_text = "WILL NOT COMPLETE"
+            message = "Customer likely to abandon booking"
+
+        st.markdown(f"""
+            <div class="prediction-box {box_class}">
+                <h1 style="font-size: 3rem; margin: 0;">{emoji}</h1>
+                <h2 style="margin: 0.5rem 0;">{result_text}</h2>
+                <p style="margin: 0; font-size: 1.1rem;">{message}</p>
+            </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown("### 📈 Key Metrics")
+        st.metric("Model Confidence", f"{confidence_score*100:.1f}%")
+        st.metric("Risk Level",
+                 "🔴 HIGH" if prediction == 0 else "🟡 MEDIUM" if confidence_score < LOW_RISK_THRESHOLD else "🟢 LOW")
+        st.metric("Follow-up Priority",
+                 "URGENT" if prediction == 0 else "STANDARD")
+
+    # Detailed analysis section
+    st.markdown("---")
+    st.markdown("## 📊 Detailed Analysis")
+
+    analysis_col1, analysis_col2 = st.columns([2, 1])
+
+    with analysis_col1:
+        st.markdown("### 🔍 Booking Profile Analysis")
+        st.dataframe(result['profile'], use_container_width=True, hide_index=True)
+
+    with analysis_col2:
+        # Features the model weighed most for this booking
+        st.markdown("### 📌 Key Factors Identified")
+        factor_cols = st.columns(len(result['factors']))
+
+        for factor_col, factor in zip(factor_cols, result['factors']):
+            with factor_col:
+                text = f"{factor['label']}: {factor['value']:g}"
+                if factor['contribution'] < 0:
+                    st.error(f"⬇️ {text}")
+                else:
+                    st.success(f"⬆️ {text}")
+                st.caption(f"{factor['contribution']:+.2f} log-odds of completion")
+
+    render_actions(prediction, booking, booking_ref)
+
+
+# The scored frame stays on the server; reruns reuse it without copying
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_portfolio(file_id, version, _file, _active):
+    from src import dashboard
+
+    frame = dashboard.read_portfolio(_file, _active.model, _active.scaler, route_stats=_active.route_stats)
+    return frame, dashboard.risk_order(frame)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def portfolio_summary(file_id, version, _frame):
+    from src import dashboard
+
+    return dashboard.summarize(_frame)
+
+
+def render_dashboard(active):
+    """Triage view over a whole file of bookings: aggregates plus a paginated list sorted by risk"""
+    st.markdown("## 📊 Portfolio Dashboard")
+    uploaded = st.file_uploader("Upload bookings or batch-scorer output (CSV)", type="csv")
+    if uploaded is None:
+        st.info("ℹ️ Upload a file shaped like data/customer_booking.csv, or the output of "
+                "`python -m src.batch_score`. Unscored bookings are scored on upload.")
+        return
+    from src import dashboard
+
+    with st.spinner("Scoring and indexing bookings..."):
+        frame, order = load_portfolio(uploaded.file_id, active.version, uploaded, active)
+    summary = portfolio_summary(uploaded.file_id, active.version, frame)
+
+    # Risk tier counts
+    tier_cols = st.columns(4)
+    tier_cols[0].metric("Bookings", f"{summary['rows']:,}")
+    for tier_col, (tier, label) in zip(tier_cols[1:], zip(RISK_TIERS, ["🔴 HIGH", "🟡 MEDIUM", "🟢 LOW"])):
+        count = summary['tiers'][tier]
+        tier_col.metric(label, f"{count:,}", f"{count / max(summary['rows'], 1) * 100:.1f}%", delta_color="off")
+
+    chart_col, breakdown_col = st.columns([1, 1])
+    with chart_col:
+        st.markdown("### 📈 Completion Probability")
+        st.bar_chart(summary['histogram'])
+    with breakdown_col:
+        st.markdown("### 🧭 Breakdowns")
+        if summary['breakdowns']:
+            for tab, (label, table) in zip(st.tabs(list(summary['breakdowns'])), summary['breakdowns'].items()):
+                with tab:
+                    st.dataframe(table.round(3), use_container_width=True)
+        else:
+            st.caption("No route, origin or channel columns in this file")
+
+    # Paginated triage list; only the visible page is sent to the browser
+    st.markdown("### 🚨 Triage List")
+    filter_col, size_col, page_col = st.columns(3)
+    tier = filter_col.selectbox("Risk Tier", ["All"] + RISK_TIERS)
+    page_size = size_col.selectbox("Rows per Page", dashboard.PAGE_SIZES)
+    tier_total = summary['rows'] if tier == "All" else summary['tiers'][tier]
+    pages = max(-(-tier_total // page_size), 1)
+    page = page_col.number_input("Page", min_value=1, max_value=pages, value=1) - 1
+    rows, total = dashboard.page_rows(frame, order, page, page_size, None if tier == "All" else tier)
+    if total == 0:
+        st.caption("No bookings in this tier")
+        return
+    st.dataframe(rows, use_container_width=True)
+    st.caption(f"Rows {page * page_size + 1:,}–{page * page_size + len(rows):,} of {total:,} · page {page + 1} of {pages:,}")
+
+
+@st.fragment
+def render_actions(prediction, booking, booking_ref):
+    """Action buttons rerun only this fragment, leaving the results above untouched"""
+    from src.jobs import INCENTIVE_DISCOUNT
+
+    # Action buttons section
+    st.markdown("---")
+    st.markdown("## 🎯 Recommended Actions")
+
+    action_col1, action_col2, action_col3 = st.columns(3)
+    details = {'route': booking.route, 'booking_origin': booking.booking_origin}
+
+    def queue_action(action, done, already):
+        if get_job_queue().enqueue(action, [(booking_ref, details)]):
+            st.success(f"✅ {done}")
+        else:
+            st.info(f"ℹ️ {already}")
+
+    with action_col1:
+        if st.button("📧 Send Follow-up Email", use_container_width=True):
+            queue_action('follow_up_email', "Follow-up email queued for delivery",
+                         "A follow-up email is already queued for this booking")
+
+    with action_col2:
+        if st.button("📞 Schedule Support Call", use_container_width=True):
+            queue_action('support_call', "Support call scheduled with next available agent",
+                         "A support call is already scheduled for this booking")
+
+    with action_col3:
+        if prediction == 0:
+            if st.button("🎁 Generate Incentive Code", use_container_width=True):
+                job_queue = get_job_queue()
+                code = job_queue.issue_codes([booking_ref])[booking_ref]
+                payload = {**details, 'code': code, 'discount': INCENTIVE_DISCOUNT}
+                job_queue.enqueue('incentive_code', [(booking_ref, payload)])
+                st.success(f"✅ {INCENTIVE_DISCOUNT}% discount code: {code}")
+        else:
+            if st.button("📋 Add to Follow-up List", use_container_width=True):
+                queue_action('follow_up_list', "Added to standard follow-up queue",
+                             "This booking is already on the follow-up list")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
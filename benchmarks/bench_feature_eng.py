@@ -0,0 +1,49 @@
+"""Compare engineer_features with engineer_feature_matrix on data/customer_booking.csv
+
+Run from the repository root:  python -m benchmarks.bench_feature_eng
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.batch_score import BOOKING_DTYPES, map_flight_day
+from src.feature_eng import engineer_feature_matrix, engineer_features, get_feature_columns
+
+
+def best_of(fn, repeat):
+    """Best wall-clock time of `repeat` calls"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1_000, 50_000, 500_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    base = pd.read_csv('data/customer_booking.csv', dtype=BOOKING_DTYPES, encoding='ISO-8859-1')
+    base['flight_day'] = map_flight_day(base['flight_day'])
+
+    # Output must match the DataFrame path exactly on the full file
+    expected = engineer_features(base.copy())[get_feature_columns()].to_numpy(np.float32)
+    actual = engineer_feature_matrix(base)
+    assert np.array_equal(expected, actual), "engineer_feature_matrix differs from engineer_features"
+
+    print(f"{'rows':>10} {'engineer_features':>18} {'feature_matrix':>15} {'speedup':>8}")
+    for size in args.sizes:
+        df = base.iloc[np.arange(size) % len(base)].reset_index(drop=True)
+        out = np.empty((size, len(get_feature_columns())), dtype=np.float32)
+        old = best_of(lambda: engineer_features(df.copy())[get_feature_columns()].to_numpy(np.float32), args.repeat)
+        new = best_of(lambda: engineer_feature_matrix(df, out=out), args.repeat)
+        print(f"{size:>10,} {old * 1e3:>16.2f}ms {new * 1e3:>13.2f}ms {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
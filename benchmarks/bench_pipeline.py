@@ -0,0 +1,175 @@
+"""Time and memory-profile each stage of the prediction pipeline on synthetic bookings
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline                      # write benchmarks/results/<commit>.json
+    python -m benchmarks.bench_pipeline --compare            # ...and compare with benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --save-baseline      # replace the stored baseline
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.batch_score import BOOKING_DTYPES, map_flight_day
+from src.feature_eng import engineer_feature_matrix, engineer_features, get_feature_columns
+from src.scoring import classify, load_model_and_scaler
+from src.suggest import create_prediction_visual, get_suggestions, suggestion_masks
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+DEFAULT_SIZES = [1, 1_000, 100_000, 1_000_000]
+
+# Per-booking stages run a Python call per row; cap them so large sizes stay practical
+PER_ROW_LIMIT = {'get_suggestions': 100_000, 'create_prediction_visual': 100}
+
+
+def synthetic_bookings(n, source='data/customer_booking.csv', seed=42):
+    """Bookings sampled column by column from the marginal distributions of the source file"""
+    base = pd.read_csv(source, dtype=BOOKING_DTYPES, encoding='ISO-8859-1')
+    base['flight_day'] = map_flight_day(base['flight_day'])
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name in BOOKING_DTYPES:
+        counts = base[name].value_counts()
+        columns[name] = rng.choice(counts.index.to_numpy(), size=n, p=(counts / counts.sum()).to_numpy())
+    df = pd.DataFrame(columns)
+    return df.astype({name: dtype for name, dtype in BOOKING_DTYPES.items() if name != 'flight_day'})
+
+
+def build_stages(model, scaler, compiled_model, df):
+    """(name, rows, setup, run) for every pipeline stage; setup output is passed to run untimed"""
+    feature_cols = get_feature_columns()
+    X = engineer_feature_matrix(df)
+    X_df = pd.DataFrame(X, columns=feature_cols)
+    records = None
+    if len(df) <= PER_ROW_LIMIT['get_suggestions']:
+        records = df.to_dict('records')
+        for record in records:
+            record['total_extras'] = record['wants_extra_baggage'] + record['wants_preferred_seat'] + record['wants_in_flight_meals']
+            record['inconvenient_flight_time'] = int(record['flight_hour'] < 6 or record['flight_hour'] >= 22)
+    probability = model.predict_proba(X)[:, 1]
+    prediction, confidence = classify(probability)
+
+    stages = [
+        ('engineer_features', len(df), lambda: df.copy(), lambda data: engineer_features(data)[feature_cols]),
+        ('engineer_feature_matrix', len(df), lambda: None, lambda _: engineer_feature_matrix(df)),
+        ('scaler.transform', len(df), lambda: None, lambda _: scaler.transform(X_df)),
+        ('model.predict_proba', len(df), lambda: None, lambda _: model.predict_proba(X)),
+    ]
+    if compiled_model is not None:
+        stages.append(('compiled.predict_proba', len(df), lambda: None, lambda _: compiled_model.predict_proba(X)))
+    stages.append(('suggestion_masks', len(df), lambda: None, lambda _: suggestion_masks(prediction, confidence, df)))
+    if records is not None:
+        stages.append(('get_suggestions', len(df), lambda: None,
+                       lambda _: [get_suggestions(p, c, r) for p, c, r in zip(prediction, confidence, records)]))
+    n_visual = min(len(df), PER_ROW_LIMIT['create_prediction_visual'])
+    stages.append(('create_prediction_visual', n_visual, lambda: None,
+                   lambda _: [create_prediction_visual(prediction[i], confidence[i]) for i in range(n_visual)]))
+    return stages
+
+
+def measure(setup, run, repeat):
+    """Best wall-clock seconds over `repeat` runs, then peak traced allocation of one run"""
+    best = float('inf')
+    for _ in range(repeat):
+        data = setup()
+        start = time.perf_counter()
+        run(data)
+        best = min(best, time.perf_counter() - start)
+    data = setup()
+    tracemalloc.start()
+    run(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline, tolerance):
+    """Print per-stage ratios against the baseline; return the regressed stages"""
+    previous = {(r['stage'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"\nCompared with baseline {baseline['commit']} (regression if slower than {tolerance:.2f}x):")
+    for r in results:
+        old = previous.get((r['stage'], r['size']))
+        if old is None:
+            continue
+        ratio = r['seconds'] / max(old['seconds'], 1e-9)
+        flag = 'REGRESSION' if ratio > tolerance else ''
+        print(f"  {r['stage']:<26} {r['size']:>10,} {ratio:>7.2f}x {flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (sizes >= 100k run once)")
+    parser.add_argument('--output', help="results JSON (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', action='store_true', help="compare with benchmarks/baseline.json")
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    model, scaler = load_model_and_scaler()
+    try:
+        compiled_model, _ = load_model_and_scaler(compiled=True)
+    except FileNotFoundError:
+        compiled_model = None
+
+    results = []
+    print(f"{'stage':<26} {'size':>10} {'rows':>8} {'seconds':>10} {'rows/sec':>12} {'peak MB':>9}")
+    for size in args.sizes:
+        df = synthetic_bookings(size)
+        repeat = args.repeat if size < 100_000 else 1
+        for stage, rows, setup, run in build_stages(model, scaler, compiled_model, df):
+            seconds, peak = measure(setup, run, repeat)
+            results.append({'stage': stage, 'size': size, 'rows': rows, 'seconds': seconds,
+                            'rows_per_sec': rows / max(seconds, 1e-12), 'peak_bytes': peak})
+            print(f"{stage:<26} {size:>10,} {rows:>8,} {seconds:>10.5f} {rows / max(seconds, 1e-12):>12,.0f} "
+                  f"{peak / 2 ** 20:>9.2f}")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    status = 0
+    if args.compare and os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            status = 1 if compare(results, json.load(f), args.tolerance) else 0
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.booking import FLIGHT_DAY_MAP, REQUIRED_FIELDS
+from src.dataset_store import file_sha256
+from src.drift import DriftMonitor
+from src.explain import factor_columns, score_and_explain
+from src.feature_eng import get_feature_columns, engineer_feature_matrix
+from src.jobs import JobQueue, enqueue_bookings
+from src.scoring import RISK_TIERS, load_model_and_scaler, risk_tier_codes, score_features
+from src.shadow import ShadowScorer, load_candidates
+from src.suggest import suggestion_masks
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Column types of data/customer_booking.csv, so chunks skip dtype inference
+BOOKING_DTYPES = {
+    'num_passengers': np.int64,
+    'sales_channel': object,
+    'trip_type': object,
+    'purchase_lead': np.int64,
+    'length_of_stay': np.int64,
+    'flight_hour': np.int64,
+    'flight_day': object,
+    'route': object,
+    'booking_origin': object,
+    'wants_extra_baggage': np.int64,
+    'wants_preferred_seat': np.int64,
+    'wants_in_flight_meals': np.int64,
+    'flight_duration': np.float64,
+}
+
+
+def read_bookings(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Read a booking file in bounded-size chunks"""
+    return pd.read_csv(path, chunksize=chunksize, dtype=BOOKING_DTYPES, encoding='ISO-8859-1')
+
+
+def map_flight_day(flight_day):
+    """Map 'Mon'..'Sun' to 1..7, leaving numeric days untouched"""
+    if flight_day.dtype == object:
+        mapped = flight_day.map(FLIGHT_DAY_MAP)
+        numeric = pd.to_numeric(flight_day, errors='coerce')
+        return mapped.fillna(numeric).fillna(0).astype(np.int64)
+    return flight_day
+
+
+def chunk_columns(chunk):
+    """Raw model inputs of a chunk as arrays, with flight_day mapped to 1..7"""
+    columns = {name: chunk[name].to_numpy() for name in REQUIRED_FIELDS}
+    columns['flight_day'] = map_flight_day(chunk['flight_day']).to_numpy()
+    return columns
+
+
+def chunk_features(chunk, out=None, route_stats=None):
+    """Feature matrix for a chunk of raw bookings"""
+    return engineer_feature_matrix(chunk_columns(chunk), out=out, route_stats=route_stats)
+
+
+def scores_frame(chunk, prediction, probability, confidence, factors=None, codes=None, masks=None):
+    """Output columns for scored bookings; suggestion_mask decodes with src.suggest.decode_suggestions
+
+    Risk tier codes and suggestion masks already computed elsewhere (e.g. by
+    parallel_score workers) can be passed instead of confidence.
+    """
+    if codes is None:
+        codes = risk_tier_codes(prediction, confidence)
+    if masks is None:
+        masks = suggestion_masks(prediction, confidence, chunk)
+    metrics.count_risk_tiers(codes, RISK_TIERS)
+    tiers = np.asarray(RISK_TIERS)[codes]
+    columns = {
+        'prediction': prediction,
+        'probability': probability.round(6),
+        'risk_tier': tiers,
+        'suggestion_mask': masks,
+    }
+    if factors is not None:
+        columns.update(factor_columns(*factors))
+    return pd.DataFrame(columns, index=chunk.index)
+
+
+def score_chunk(model, scaler, chunk, out=None, shadow=None, drift=None, explain=0, jobs=None, source=None,
+                route_stats=None):
+    """Score one chunk of raw bookings, returning prediction, probability, risk tier and the top explain factors
+
+    With a src.jobs.JobQueue, follow-up actions for the chunk's HIGH-risk bookings are queued too;
+    source identifies the booking file they came from (see src.jobs.row_ids).
+    """
+    columns = chunk_columns(chunk)
+    X = engineer_feature_matrix(columns, out=out, route_stats=route_stats)
+    start = time.perf_counter()
+    factors = None
+    if explain:
+        prediction, probability, confidence, *factors = score_and_explain(model, scaler, X, explain)
+    else:
+        prediction, probability, confidence = score_features(model, scaler, X)
+    if shadow is not None:
+        shadow.submit(columns, probability, time.perf_counter() - start)
+    if drift is not None:
+        drift.update(X)
+    scored = scores_frame(chunk, prediction, probability, confidence, factors)
+    if jobs is not None:
+        enqueue_bookings(jobs, chunk, scored, source)
+    return scored
+
+
+def score_bookings(path, model=None, scaler=None, chunksize=DEFAULT_CHUNKSIZE, keep_input=True, shadow=None,
+                   drift=None, explain=0, jobs=None):
+    """Stream scored chunks for a booking file, one predict_proba call per chunk"""
+    if model is None:
+        model, scaler = load_model_and_scaler()
+    buffer = np.empty((chunksize, len(get_feature_columns())), dtype=np.float32)
+    source = file_sha256(path)[:16] if jobs is not None else None
+    for chunk in read_bookings(path, chunksize):
+        scored = score_chunk(model, scaler, chunk, out=buffer[:len(chunk)], shadow=shadow, drift=drift,
+                             explain=explain, jobs=jobs, source=source)
+        if keep_input:
+            scored = pd.concat([chunk, scored], axis=1)
+        yield scored
+
+
+def score_file(input_path, output_path, model=None, scaler=None, chunksize=DEFAULT_CHUNKSIZE, keep_input=True,
+               shadow=None, drift=None, explain=0, jobs=None):
+    """Score a booking file into a CSV and return (rows, seconds)"""
+    start = time.perf_counter()
+    rows = 0
+    header = True
+    with open(output_path, 'w', newline='') as out:
+        for scored in score_bookings(input_path, model, scaler, chunksize, keep_input, shadow,
+                                     drift, explain, jobs):
+            scored.to_csv(out, header=header, index=False)
+            header = False
+            rows += len(scored)
+    return rows, time.perf_counter() - start
+
+
+def write_synthetic_bookings(path, n_rows, source='data/customer_booking.csv', chunksize=DEFAULT_CHUNKSIZE, seed=42):
+    """Write n_rows bookings resampled from a source file, chunk by chunk"""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(source, dtype=BOOKING_DTYPES, encoding='ISO-8859-1')
+    base = base.drop(columns=['booking_complete'], errors='ignore')
+    written = 0
+    with open(path, 'w', newline='') as out:
+        while written < n_rows:
+            size = min(chunksize, n_rows - written)
+            sample = base.iloc[rng.integers(0, len(base), size)]
+            sample.to_csv(out, header=(written == 0), index=False)
+            written += size
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a booking file in chunks")
+    parser.add_argument('input', help="CSV shaped like data/customer_booking.csv")
+    parser.add_argument('-o', '--output', default='-', help="output CSV (default: stdout)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--scores-only', action='store_true', help="write only the score columns")
+    parser.add_argument('--compiled', action='store_true',
+                        help="score with model/best_model.npz (no lightgbm/sklearn) instead of the pickles")
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help="first write N rows resampled from data/customer_booking.csv to INPUT")
+    parser.add_argument('--shadow', action='append', default=[], metavar='MODEL_DIR',
+                        help="compare a candidate model on every chunk and print the summary (repeatable)")
+    parser.add_argument('--drift', action='store_true',
+                        help="track feature drift against model/drift_reference.npz and print the report")
+    parser.add_argument('--explain', type=int, default=0, metavar='K',
+                        help="add the K features contributing most to each prediction")
+    parser.add_argument('--enqueue', action='store_true',
+                        help="queue follow-up actions for HIGH-risk bookings (processed by python -m src.jobs work)")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        start = time.perf_counter()
+        write_synthetic_bookings(args.input, args.synthetic, chunksize=args.chunksize)
+        print(f"Wrote {args.synthetic:,} synthetic rows in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    model, scaler = load_model_and_scaler(compiled=args.compiled)
+    shadow = ShadowScorer(load_candidates(args.shadow, args.compiled)) if args.shadow else None
+    drift = DriftMonitor() if args.drift else None
+    jobs = JobQueue() if args.enqueue else None
+    if args.output == '-':
+        start = time.perf_counter()
+        rows = 0
+        for i, scored in enumerate(score_bookings(args.input, model, scaler, args.chunksize, not args.scores_only,
+                                                  shadow, drift, args.explain, jobs)):
+            scored.to_csv(sys.stdout, header=(i == 0), index=False)
+            rows += len(scored)
+        seconds = time.perf_counter() - start
+    else:
+        rows, seconds = score_file(args.input, args.output, model, scaler, args.chunksize, not args.scores_only,
+                                   shadow, drift, args.explain, jobs)
+
+    print(f"Scored {rows:,} rows in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/sec)", file=sys.stderr)
+    if shadow is not None:
+        shadow.join()
+        print(json.dumps(shadow.summary(), indent=2), file=sys.stderr)
+    if jobs is not None:
+        print(json.dumps(jobs.counts(), indent=2), file=sys.stderr)
+    if drift is not None:
+        report = drift.report()
+        print(json.dumps(report, indent=2), file=sys.stderr)
+        return 1 if any(entry['status'] == 'alert' for entry in report['features']) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+
+from src.route_stats import ROUTE_STATS_DTYPE, ROUTE_WIDTH, normalize_route
+
+# Category code = index, matching the *_encoded model features
+SALES_CHANNELS = ('Internet', 'Mobile')
+TRIP_TYPES = ('RoundTrip', 'OneWay', 'CircleTrip')
+
+FLIGHT_DAY_MAP = {'Mon': 1, 'Tue': 2, 'Wed': 3, 'Thu': 4, 'Fri': 5, 'Sat': 6, 'Sun': 7}
+
+# One booking per record, as accepted by engineer_feature_matrix and suggestion_masks;
+# sales_channel and trip_type hold codes, booking_origin is not a model input and is left out
+BOOKING_DTYPE = np.dtype([
+    ('num_passengers', 'u1'),
+    ('sales_channel', 'u1'),
+    ('trip_type', 'u1'),
+    ('purchase_lead', '<i2'),
+    ('length_of_stay', '<i2'),
+    ('flight_hour', 'u1'),
+    ('flight_day', 'u1'),
+    ('route', ROUTE_STATS_DTYPE['route']),
+    ('wants_extra_baggage', 'u1'),
+    ('wants_preferred_seat', 'u1'),
+    ('wants_in_flight_meals', 'u1'),
+    ('flight_duration', '<f8'),
+    ('total_extras', 'u1'),
+    ('inconvenient_flight_time', 'u1'),
+])
+
+REQUIRED_FIELDS = ('num_passengers', 'sales_channel', 'trip_type', 'purchase_lead', 'length_of_stay', 'flight_hour',
+                   'flight_day', 'route', 'wants_extra_baggage', 'wants_preferred_seat', 'wants_in_flight_meals',
+                   'flight_duration')
+
+
+def _integer(name, value, low, high):
+    try:
+        number = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"Field {name!r} must be numeric") from None
+    if value != number and not isinstance(value, str):
+        raise ValueError(f"Field {name!r} must be a whole number")
+    if not low <= number <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return number
+
+
+def _category(name, value, categories):
+    if isinstance(value, str):
+        if value not in categories:
+            raise ValueError(f"Unknown {name} {value!r}")
+        return categories.index(value)
+    return _integer(name, value, 0, len(categories) - 1)
+
+
+def _flight_day(value):
+    if isinstance(value, str):
+        day = FLIGHT_DAY_MAP.get(value[:3].title())
+        if day is None:
+            raise ValueError(f"Unknown flight_day {value!r}")
+        return day
+    return _integer('flight_day', value, 1, 7)
+
+
+class BookingRecord:
+    """One validated booking with categorical codes and the derived fields computed once
+
+    Indexing by field name (record['sales_channel']) returns the values the
+    suggestion rules and cache keys expect, so a record can stand in for the
+    booking dicts used elsewhere.
+    """
+
+    __slots__ = ('num_passengers', 'sales_channel_code', 'trip_type_code', 'purchase_lead', 'length_of_stay',
+                 'flight_hour', 'flight_day', 'route', 'wants_extra_baggage', 'wants_preferred_seat',
+                 'wants_in_flight_meals', 'flight_duration', 'total_extras', 'inconvenient_flight_time',
+                 'booking_origin')
+
+    def __init__(self, num_passengers, sales_channel, trip_type, purchase_lead, length_of_stay, flight_hour,
+                 flight_day, route, wants_extra_baggage, wants_preferred_seat, wants_in_flight_meals, flight_duration,
+                 booking_origin=''):
+        self.num_passengers = _integer('num_passengers', num_passengers, 1, 255)
+        self.sales_channel_code = _category('sales_channel', sales_channel, SALES_CHANNELS)
+        self.trip_type_code = _category('trip_type', trip_type, TRIP_TYPES)
+        self.purchase_lead = _integer('purchase_lead', purchase_lead, 0, np.iinfo(np.int16).max)
+        self.length_of_stay = _integer('length_of_stay', length_of_stay, 0, np.iinfo(np.int16).max)
+        self.flight_hour = _integer('flight_hour', flight_hour, 0, 23)
+        self.flight_day = _flight_day(flight_day)
+        if not isinstance(route, str):
+            raise ValueError(f"Field 'route' must be a string, got {type(route).__name__}")
+        self.route = normalize_route(route)
+        if not self.route:
+            raise ValueError("Field 'route' must not be empty")
+        if len(self.route) > ROUTE_WIDTH:
+            raise ValueError(f"Route {route!r} is longer than {ROUTE_WIDTH} characters")
+        self.wants_extra_baggage = _integer('wants_extra_baggage', wants_extra_baggage, 0, 1)
+        self.wants_preferred_seat = _integer('wants_preferred_seat', wants_preferred_seat, 0, 1)
+        self.wants_in_flight_meals = _integer('wants_in_flight_meals', wants_in_flight_meals, 0, 1)
+        try:
+            self.flight_duration = float(flight_duration)
+        except (TypeError, ValueError):
+            raise ValueError("Field 'flight_duration' must be numeric") from None
+        if not math.isfinite(self.flight_duration):
+            raise ValueError("Field 'flight_duration' must be a finite number")
+        if self.flight_duration <= 0:
+            raise ValueError("Field 'flight_duration' must be positive")
+        self.booking_origin = str(booking_origin)
+        self.total_extras = self.wants_extra_baggage + self.wants_preferred_seat + self.wants_in_flight_meals
+        self.inconvenient_flight_time = int(self.flight_hour < 6 or self.flight_hour >= 22)
+
+    @classmethod
+    def from_mapping(cls, data):
+        """Validate a booking dict such as a JSON payload"""
+        missing = [name for name in REQUIRED_FIELDS if name not in data]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+        return cls(**{name: data[name] for name in REQUIRED_FIELDS}, booking_origin=data.get('booking_origin', ''))
+
+    @property
+    def sales_channel(self):
+        return SALES_CHANNELS[self.sales_channel_code]
+
+    @property
+    def trip_type(self):
+        return TRIP_TYPES[self.trip_type_code]
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __repr__(self):
+        return f"BookingRecord({self.route}, {self.num_passengers} pax, lead {self.purchase_lead}d)"
+
+    def astuple(self):
+        """Values in BOOKING_DTYPE field order"""
+        return (self.num_passengers, self.sales_channel_code, self.trip_type_code, self.purchase_lead,
+                self.length_of_stay, self.flight_hour, self.flight_day, self.route, self.wants_extra_baggage,
+                self.wants_preferred_seat, self.wants_in_flight_meals, self.flight_duration, self.total_extras,
+                self.inconvenient_flight_time)
+
+    def to_array(self):
+        return np.array([self.astuple()], dtype=BOOKING_DTYPE)
+
+
+def records_to_array(records):
+    """Structured BOOKING_DTYPE array for a batch of records"""
+    return np.array([record.astuple() for record in records], dtype=BOOKING_DTYPE)
@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+from src.route_stats import normalize_route
+
+DEFAULT_MAXSIZE = 512
+DEFAULT_TTL = 15 * 60.0
+
+# Booking fields a prediction depends on; booking_origin is not a model input
+PREDICTION_FIELDS = ('num_passengers', 'sales_channel', 'trip_type', 'purchase_lead', 'length_of_stay',
+                     'flight_hour', 'flight_day', 'route', 'wants_extra_baggage', 'wants_preferred_seat',
+                     'wants_in_flight_meals', 'flight_duration')
+
+
+def booking_key(booking, fields=PREDICTION_FIELDS):
+    """Hashable key for a booking, so inputs that score identically share a cache entry"""
+    key = []
+    for name in fields:
+        value = booking[name]
+        if name == 'route':
+            value = normalize_route(value)
+        elif not isinstance(value, str):
+            # 5, 5.0 and True/1 produce the same features
+            value = float(value)
+        key.append(value)
+    return tuple(key)
+
+
+class PredictionCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.clock() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, computing and storing it on a miss; returns (value, hit)"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions,
+        }
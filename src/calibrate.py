@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from src.scoring import (CLASS_THRESHOLD, LOW_RISK_THRESHOLD, MODEL_DIR, RISK_TIERS, THRESHOLDS_PATH,
+                         load_model_and_scaler, score_features)
+
+DEFAULT_DATA = os.path.join(os.path.dirname(MODEL_DIR), 'data', 'customer_booking.csv')
+
+# Per-booking cost of each tier's action and the share of would-be-abandoned bookings it wins back
+DEFAULT_COSTS = {
+    'booking_value': 500.0,
+    'action_cost': {'HIGH': 25.0, 'MEDIUM': 2.0, 'LOW': 0.0},
+    'recovery': {'HIGH': 0.20, 'MEDIUM': 0.05, 'LOW': 0.0},
+}
+
+
+def score_dataset(path=DEFAULT_DATA, model=None, scaler=None, chunksize=100_000):
+    """Completion probabilities and booking_complete labels for a labelled booking file"""
+    from src.batch_score import chunk_features, read_bookings
+
+    if model is None:
+        model, scaler = load_model_and_scaler()
+    probabilities, labels = [], []
+    for chunk in read_bookings(path, chunksize):
+        _, probability, _ = score_features(model, scaler, chunk_features(chunk))
+        probabilities.append(probability)
+        labels.append(chunk['booking_complete'].to_numpy(dtype=np.int8))
+    return np.concatenate(probabilities), np.concatenate(labels)
+
+
+def confusion_curve(probability, label):
+    """Cumulative confusion counts for a cut before every distinct probability (and after the last)
+
+    Returns the sorted probabilities, the row position of each cut, and the
+    completed / abandoned bookings below each cut, i.e. the false and true
+    negatives when everything below the cut is predicted to abandon.
+    """
+    order = np.argsort(probability, kind='stable')
+    probability = probability[order]
+    completed = np.concatenate([[0], np.cumsum(label[order], dtype=np.int64)])
+    positions = np.concatenate([[0], np.flatnonzero(np.diff(probability)) + 1, [len(probability)]])
+    completed_below = completed[positions]
+    return probability, positions, completed_below, positions - completed_below
+
+
+def cut_threshold(probability, position):
+    """Cut-off separating sorted rows below position from the rest"""
+    if position == 0:
+        return 0.0
+    if position == len(probability):
+        return 1.0
+    return float((probability[position - 1] + probability[position]) / 2)
+
+
+def tier_costs(costs):
+    """(cost of a completed booking, cost of an abandoned booking) in each tier"""
+    value = costs['booking_value']
+    return {tier: (costs['action_cost'][tier], costs['action_cost'][tier] + value * (1 - costs['recovery'][tier]))
+            for tier in RISK_TIERS}
+
+
+def optimal_thresholds(probability, label, costs=DEFAULT_COSTS):
+    """Cost-minimizing HIGH/MEDIUM and MEDIUM/LOW cut-offs in one pass over the sorted scores
+
+    With rows sorted by probability, HIGH takes rows [0, i), MEDIUM [i, j) and
+    LOW [j, n). Total cost splits into A[i] + B[j] + const, so the best pair
+    with i <= j comes from a running minimum of A.
+    """
+    probability, positions, completed_below, abandoned_below = confusion_curve(probability, label)
+    per_tier = tier_costs(costs)
+
+    def below(tier):
+        completed_cost, abandoned_cost = per_tier[tier]
+        return completed_cost * completed_below + abandoned_cost * abandoned_below
+
+    high, medium, low = (below(tier) for tier in RISK_TIERS)
+    a = high - medium
+    b = medium - low
+    best_a = np.minimum.accumulate(a)
+    j = int(np.argmin(best_a + b))
+    i = int(np.argmin(a[:j + 1]))
+    total = float(a[i] + b[j] + low[-1])
+    return cut_threshold(probability, positions[i]), cut_threshold(probability, positions[j]), total
+
+
+def expected_cost(probability, label, class_threshold, low_risk_threshold, costs=DEFAULT_COSTS):
+    """Total cost of tiering bookings with the given cut-offs"""
+    tier = np.where(probability <= class_threshold, 0, np.where(probability < low_risk_threshold, 1, 2))
+    per_tier = np.array([tier_costs(costs)[name] for name in RISK_TIERS])
+    return float(per_tier[tier, 1 - label].sum())
+
+
+def tier_summary(probability, label, class_threshold, low_risk_threshold):
+    tier = np.where(probability <= class_threshold, 0, np.where(probability < low_risk_threshold, 1, 2))
+    return {name: {'bookings': int((tier == code).sum()), 'completed': int(label[tier == code].sum())}
+            for code, name in enumerate(RISK_TIERS)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Choose cost-optimal class and risk-tier thresholds")
+    parser.add_argument('data', nargs='?', default=DEFAULT_DATA, help="labelled booking CSV")
+    parser.add_argument('-o', '--output', default=THRESHOLDS_PATH)
+    parser.add_argument('--booking-value', type=float, default=DEFAULT_COSTS['booking_value'],
+                        help="revenue lost when a booking is abandoned")
+    for tier in RISK_TIERS:
+        parser.add_argument(f'--{tier.lower()}-cost', type=float, default=DEFAULT_COSTS['action_cost'][tier],
+                            help=f"cost per booking of the {tier} tier action")
+        parser.add_argument(f'--{tier.lower()}-recovery', type=float, default=DEFAULT_COSTS['recovery'][tier],
+                            help=f"share of abandoning {tier} bookings the action recovers")
+    parser.add_argument('--compiled', action='store_true', help="score with model/best_model.npz")
+    parser.add_argument('--dry-run', action='store_true', help="print the thresholds without writing them")
+    args = parser.parse_args(argv)
+
+    costs = {
+        'booking_value': args.booking_value,
+        'action_cost': {tier: getattr(args, f'{tier.lower()}_cost') for tier in RISK_TIERS},
+        'recovery': {tier: getattr(args, f'{tier.lower()}_recovery') for tier in RISK_TIERS},
+    }
+    model, scaler = load_model_and_scaler(compiled=args.compiled)
+    start = time.perf_counter()
+    probability, label = score_dataset(args.data, model, scaler)
+    scored = time.perf_counter()
+    class_threshold, low_risk_threshold, total = optimal_thresholds(probability, label, costs)
+    print(f"Scored {len(probability):,} bookings in {scored - start:.1f}s, "
+          f"searched thresholds in {(time.perf_counter() - scored) * 1e3:.0f} ms", file=sys.stderr)
+
+    config = {
+        'class_threshold': class_threshold,
+        'low_risk_threshold': low_risk_threshold,
+        'expected_cost': total,
+        'current_cost': expected_cost(probability, label, CLASS_THRESHOLD, LOW_RISK_THRESHOLD, costs),
+        'tiers': tier_summary(probability, label, class_threshold, low_risk_threshold),
+        'costs': costs,
+        'data': os.path.abspath(args.data),
+        'rows': len(probability),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+    print(json.dumps(config, indent=2))
+    if not args.dry_run:
+        tmp_path = f"{args.output}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"Wrote {args.output}; restart the app and scorers to apply it", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
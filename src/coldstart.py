@@ -0,0 +1,92 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'app.py')
+
+# A fresh replica should import, load, warm up and answer its first booking within this many seconds
+DEFAULT_BUDGET = 1.0
+PHASES = ('import', 'load', 'first_prediction')
+
+# Runs in a fresh interpreter so every import and artifact load is cold
+PROBE = '''
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in json.loads(sys.argv[2]):
+    importlib.import_module(name)
+from src.booking import BookingRecord
+from src.explain import explain_features
+from src.feature_eng import engineer_feature_matrix
+from src.registry import ModelHandle
+from src.scoring import score_features
+from src.suggest import get_suggestions
+imported = time.perf_counter()
+active = ModelHandle(compiled=sys.argv[1] == '1').get()  # includes the boot warm-up
+loaded = time.perf_counter()
+booking = BookingRecord(2, 'Internet', 'RoundTrip', 30, 7, 9, 3, 'LHR-JFK', 1, 0, 1, 7.5)
+X = engineer_feature_matrix(booking.to_array(), route_stats=active.route_stats)
+prediction, probability, confidence = score_features(active.model, active.scaler, X)
+explain_features(active.model, active.scaler, X)
+get_suggestions(int(prediction[0]), float(confidence[0]), booking)
+done = time.perf_counter()
+print(json.dumps({'import': imported - start, 'load': loaded - imported, 'first_prediction': done - loaded,
+                  'modules': [name for name in ('streamlit', 'pandas', 'sklearn', 'lightgbm', 'plotly', 'scipy') if name in sys.modules]}))
+'''
+
+
+def app_imports(path=APP):
+    """Modules the Streamlit app imports at load time, so the probe pays for the same import set"""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    return names
+
+
+def measure(compiled=True, repeat=3):
+    """Median seconds per cold-start phase over fresh interpreters, plus the heavy modules they imported"""
+    imports = json.dumps(app_imports())
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', PROBE, '1' if compiled else '0', imports], cwd=ROOT,
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output))
+    result = {phase: float(np.median([run[phase] for run in runs])) for phase in PHASES}
+    result['total'] = sum(result[phase] for phase in PHASES)
+    result['modules'] = runs[-1]['modules']
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold-start latency of a fresh replica")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help="seconds allowed for a cold start")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--compare', action='store_true', help="also measure the pickled model")
+    args = parser.parse_args(argv)
+
+    variants = [True, False] if args.compare else [True]
+    over_budget = False
+    for compiled in variants:
+        result = measure(compiled, args.repeat)
+        phases = ', '.join(f"{phase} {result[phase] * 1e3:.0f} ms" for phase in PHASES)
+        print(f"{'compiled' if compiled else 'pickled'}: {phases}, total {result['total'] * 1e3:.0f} ms "
+              f"(heavy imports: {', '.join(result['modules']) or 'none'})")
+        over_budget |= compiled and result['total'] > args.budget
+    if over_budget:
+        print(f"Cold start exceeds the {args.budget:.2f}s budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.batch_score import BOOKING_DTYPES, DEFAULT_CHUNKSIZE, score_chunk
+from src.scoring import RISK_TIERS, classify, load_model_and_scaler, risk_tier_codes
+
+PAGE_SIZES = (25, 50, 100)
+HISTOGRAM_BINS = 20
+BREAKDOWN_TOP = 15
+BREAKDOWN_COLUMNS = {'route': 'Route', 'booking_origin': 'Origin', 'sales_channel': 'Channel'}
+
+# Columns shown in the triage table, when present
+TRIAGE_COLUMNS = ['risk_tier', 'probability', 'route', 'booking_origin', 'sales_channel', 'num_passengers',
+                  'purchase_lead', 'length_of_stay', 'flight_day', 'flight_hour', 'trip_type']
+
+
+def read_portfolio(file, model=None, scaler=None, chunksize=DEFAULT_CHUNKSIZE, route_stats=None):
+    """Bookings with probability and a categorical risk_tier; raw bookings are scored chunk by chunk
+
+    Accepts data/customer_booking.csv-shaped files or src.batch_score output
+    (with or without the input columns). Pass the model version's route_stats
+    so rows score as they would in the single-booking view.
+    """
+    chunks = []
+    with metrics.timer('dashboard_load'):
+        for chunk in pd.read_csv(file, chunksize=chunksize, dtype=BOOKING_DTYPES, encoding='ISO-8859-1'):
+            if 'probability' not in chunk:
+                if model is None:
+                    model, scaler = load_model_and_scaler()
+                chunk = pd.concat([chunk, score_chunk(model, scaler, chunk, route_stats=route_stats)], axis=1)
+            chunks.append(chunk)
+        frame = pd.concat(chunks, ignore_index=True)
+
+        probability = frame['probability'].to_numpy(dtype=np.float64)
+        if 'risk_tier' in frame:
+            codes = pd.Categorical(frame['risk_tier'], categories=RISK_TIERS).codes
+        else:
+            codes = risk_tier_codes(*classify(probability))
+        frame['risk_tier'] = pd.Categorical.from_codes(codes, RISK_TIERS)
+        # Categoricals keep group-bys over a million rows cheap
+        for column in BREAKDOWN_COLUMNS:
+            if column in frame:
+                frame[column] = frame[column].astype('category')
+    return frame
+
+
+def risk_order(frame):
+    """Row positions sorted HIGH -> LOW, least likely to complete first within a tier"""
+    return np.lexsort((frame['probability'].to_numpy(), frame['risk_tier'].cat.codes.to_numpy()))
+
+
+def tier_counts(frame):
+    return dict(zip(RISK_TIERS, np.bincount(frame['risk_tier'].cat.codes, minlength=len(RISK_TIERS)).tolist()))
+
+
+def probability_histogram(frame, bins=HISTOGRAM_BINS):
+    """Booking counts per completion-probability bucket"""
+    counts, edges = np.histogram(frame['probability'].to_numpy(), bins=bins, range=(0.0, 1.0))
+    return pd.DataFrame({'bookings': counts}, index=pd.Index([f"{low:.2f}" for low in edges[:-1]], name='probability'))
+
+
+def breakdown(frame, column, top=BREAKDOWN_TOP):
+    """Bookings, mean probability and HIGH-risk share for the largest groups of a column"""
+    grouped = frame.assign(high_risk=frame['risk_tier'].cat.codes == 0).groupby(column, observed=True).agg(
+        bookings=('high_risk', 'size'),
+        mean_probability=('probability', 'mean'),
+        high_risk_share=('high_risk', 'mean'),
+    )
+    return grouped.nlargest(top, 'bookings')
+
+
+def summarize(frame, bins=HISTOGRAM_BINS, top=BREAKDOWN_TOP):
+    """Everything the dashboard charts, small enough to send to the browser"""
+    with metrics.timer('dashboard_aggregates'):
+        return {
+            'rows': len(frame),
+            'tiers': tier_counts(frame),
+            'histogram': probability_histogram(frame, bins),
+            'breakdowns': {label: breakdown(frame, column, top)
+                           for column, label in BREAKDOWN_COLUMNS.items() if column in frame},
+        }
+
+
+def page_rows(frame, order, page, page_size, tier=None):
+    """One page of the triage list in risk order, optionally restricted to a tier; returns (rows, total)"""
+    if tier is not None:
+        order = order[frame['risk_tier'].cat.codes.to_numpy()[order] == RISK_TIERS.index(tier)]
+    start = page * page_size
+    columns = [column for column in TRIAGE_COLUMNS if column in frame]
+    return frame.iloc[order[start:start + page_size]][columns], len(order)
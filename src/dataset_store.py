@@ -0,0 +1,267 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'bookings.store')
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+# On-disk type of every booking column; categoricals are stored as int32 codes into a per-column dictionary
+COLUMN_DTYPES = {
+    'num_passengers': np.dtype('<i2'),
+    'sales_channel': 'category',
+    'trip_type': 'category',
+    'purchase_lead': np.dtype('<i4'),
+    'length_of_stay': np.dtype('<i4'),
+    'flight_hour': np.dtype('i1'),
+    'flight_day': np.dtype('i1'),
+    'route': 'category',
+    'booking_origin': 'category',
+    'wants_extra_baggage': np.dtype('i1'),
+    'wants_preferred_seat': np.dtype('i1'),
+    'wants_in_flight_meals': np.dtype('i1'),
+    'flight_duration': np.dtype('<f8'),
+    'booking_complete': np.dtype('i1'),
+}
+CODE_DTYPE = np.dtype('<i4')
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _narrow(values, dtype, name):
+    """Cast to the stored type, refusing values that would not round-trip"""
+    values = np.asarray(values)
+    if np.issubdtype(dtype, np.integer):
+        if not np.issubdtype(values.dtype, np.integer):
+            values = values.astype(np.float64)
+            if np.isnan(values).any() or (values != np.round(values)).any():
+                raise ValueError(f"Column {name!r} must hold whole numbers")
+        info = np.iinfo(dtype)
+        if len(values) and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(f"Column {name!r} has values outside the {dtype} range")
+    return values.astype(dtype)
+
+
+class DatasetStore:
+    """Bookings stored as one raw binary file per column, memory-mapped on first access
+
+    manifest.json records the row count, column types, category dictionaries and
+    the sha256 of every ingested source file; it is only replaced after the
+    column files are written, so readers never see a partial append.
+    """
+
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported store version {self.manifest['version']}")
+        self._columns = {}
+        self._categories = {}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def __contains__(self, name):
+        return name in self.manifest['columns']
+
+    def __getitem__(self, name):
+        """Column values; categoricals are decoded through their dictionary"""
+        if self.is_categorical(name):
+            codes = self.codes(name)
+            categories = self.categories(name)
+            if len(codes) and codes.min() < 0:
+                return np.where(codes >= 0, categories[np.maximum(codes, 0)], None)
+            return categories[codes]
+        return self._column(name)
+
+    @property
+    def columns(self):
+        return list(self.manifest['columns'])
+
+    @property
+    def sources(self):
+        return self.manifest['sources']
+
+    def is_categorical(self, name):
+        return self.manifest['columns'][name]['kind'] == 'category'
+
+    def codes(self, name):
+        """Dictionary codes of a categorical column (memory-mapped, -1 for missing)"""
+        if not self.is_categorical(name):
+            raise ValueError(f"Column {name!r} is not categorical")
+        return self._column(name)
+
+    def categories(self, name):
+        """Dictionary of a categorical column as an object array indexed by code"""
+        categories = self._categories.get(name)
+        if categories is None:
+            categories = self._categories[name] = np.array(self.manifest['columns'][name]['categories'], dtype=object)
+        return categories
+
+    def _column(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            spec = self.manifest['columns'][name]
+            dtype = np.dtype(spec['dtype'])
+            if len(self) == 0:
+                column = np.empty(0, dtype=dtype)
+            else:
+                column = np.memmap(os.path.join(self.path, spec['file']), dtype=dtype, mode='r', shape=(len(self),))
+            self._columns[name] = column
+        return column
+
+    def to_frame(self, columns=None, categorical=True):
+        """DataFrame of the selected columns; categoricals become pd.Categorical over the stored codes"""
+        import pandas as pd
+
+        data = {}
+        for name in columns or self.columns:
+            if categorical and self.is_categorical(name):
+                data[name] = pd.Categorical.from_codes(self.codes(name), self.categories(name))
+            else:
+                data[name] = self[name]
+        return pd.DataFrame(data)
+
+    @classmethod
+    def create(cls, path, columns):
+        """Start an empty store with the given columns"""
+        os.makedirs(path, exist_ok=True)
+        manifest = {'version': FORMAT_VERSION, 'rows': 0, 'columns': {}, 'sources': []}
+        for name in columns:
+            kind = COLUMN_DTYPES.get(name)
+            if kind is None:
+                raise ValueError(f"No stored type for column {name!r}")
+            spec = {'file': f'{name}.bin'}
+            if kind == 'category':
+                spec.update(kind='category', dtype=CODE_DTYPE.str, categories=[])
+            else:
+                spec.update(kind='numeric', dtype=kind.str)
+            manifest['columns'][name] = spec
+            open(os.path.join(path, spec['file']), 'wb').close()
+        _write_manifest(path, manifest)
+        return cls(path)
+
+    def append(self, source, chunksize=500_000):
+        """Ingest a booking CSV unless a file with the same sha256 was already ingested; returns rows added"""
+        import pandas as pd
+
+        from src.batch_score import BOOKING_DTYPES, map_flight_day
+
+        digest = file_sha256(source)
+        if any(entry['sha256'] == digest for entry in self.sources):
+            return 0
+        manifest = json.loads(json.dumps(self.manifest))
+        specs = manifest['columns']
+        lookups = {name: {value: code for code, value in enumerate(spec['categories'])}
+                   for name, spec in specs.items() if spec['kind'] == 'category'}
+
+        # Drop bytes past the committed row count left by an interrupted append
+        for spec in specs.values():
+            with open(os.path.join(self.path, spec['file']), 'r+b') as f:
+                f.truncate(manifest['rows'] * np.dtype(spec['dtype']).itemsize)
+
+        rows = 0
+        for chunk in pd.read_csv(source, chunksize=chunksize, dtype=BOOKING_DTYPES, encoding='ISO-8859-1'):
+            missing = set(specs) - set(chunk.columns)
+            if missing:
+                raise ValueError(f"{source} is missing columns: {', '.join(sorted(missing))}")
+            encoded = {}
+            for name, spec in specs.items():
+                if spec['kind'] == 'category':
+                    codes, uniques = pd.factorize(chunk[name])
+                    lookup = lookups[name]
+                    for value in uniques:
+                        if value not in lookup:
+                            lookup[value] = len(spec['categories'])
+                            spec['categories'].append(value)
+                    mapping = np.array([lookup[value] for value in uniques] + [-1], dtype=CODE_DTYPE)
+                    encoded[name] = mapping[codes]
+                else:
+                    values = map_flight_day(chunk[name]) if name == 'flight_day' else chunk[name]
+                    encoded[name] = _narrow(values, np.dtype(spec['dtype']), name)
+            for name, spec in specs.items():
+                with open(os.path.join(self.path, spec['file']), 'ab') as f:
+                    f.write(np.ascontiguousarray(encoded[name]).tobytes())
+            rows += len(chunk)
+
+        manifest['sources'].append({
+            'path': os.path.abspath(source),
+            'sha256': digest,
+            'rows': rows,
+            'first_row': manifest['rows'],
+            'added': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        })
+        manifest['rows'] += rows
+        for spec in specs.values():
+            with open(os.path.join(self.path, spec['file']), 'rb+') as f:
+                os.fsync(f.fileno())
+        _write_manifest(self.path, manifest)
+        self.manifest = manifest
+        self._columns.clear()
+        self._categories.clear()
+        return rows
+
+
+def _write_manifest(path, manifest):
+    tmp_path = os.path.join(path, f'{MANIFEST}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+
+
+def open_store(path=DEFAULT_STORE):
+    return DatasetStore(path)
+
+
+def ingest(sources, path=DEFAULT_STORE, chunksize=500_000):
+    """Append booking CSVs to a store, creating it from the first file's header; returns the store"""
+    import pandas as pd
+
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        header = pd.read_csv(sources[0], nrows=0, encoding='ISO-8859-1').columns
+        DatasetStore.create(path, [name for name in header if name in COLUMN_DTYPES])
+    store = DatasetStore(path)
+    for source in sources:
+        start = time.perf_counter()
+        rows = store.append(source, chunksize)
+        status = f"{rows:,} rows in {time.perf_counter() - start:.2f}s" if rows else "already ingested"
+        print(f"{source}: {status}", file=sys.stderr)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar, memory-mapped store for booking CSVs")
+    parser.add_argument('command', choices=['add', 'info'])
+    parser.add_argument('sources', nargs='*', help="booking CSVs to ingest (add)")
+    parser.add_argument('--store', default=DEFAULT_STORE)
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'add':
+        if not args.sources:
+            parser.error("add needs at least one source file")
+        store = ingest(args.sources, args.store, args.chunksize)
+    else:
+        store = open_store(args.store)
+    print(f"{args.store}: {len(store):,} rows, {len(store.sources)} sources")
+    for name in store.columns:
+        spec = store.manifest['columns'][name]
+        detail = f"{len(spec['categories'])} categories" if spec['kind'] == 'category' else spec['dtype']
+        print(f"  {name:<24} {detail}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+from src import metrics
+from src.feature_eng import get_feature_columns
+from src.scoring import MODEL_DIR
+
+REFERENCE_PATH = os.path.join(MODEL_DIR, 'drift_reference.npz')
+
+# Bins per feature; features with fewer distinct values get one bin per value
+MAX_BINS = 20
+# Population stability index levels (0.1 moderate shift, 0.2 significant shift)
+PSI_WARN = 0.1
+PSI_ALERT = 0.2
+# Rows needed before a feature can raise an alert
+MIN_ROWS = 1000
+_PSI_FLOOR = 1e-4
+# Larger batches are binned from an evenly strided sample of this many rows
+SAMPLE_ROWS = 4096
+
+
+def bin_edges(values, max_bins=MAX_BINS):
+    """Inner bin edges: midpoints between distinct values, or quantiles for continuous features"""
+    distinct = np.unique(values[~np.isnan(values)])
+    if len(distinct) <= max_bins:
+        return (distinct[:-1] + distinct[1:]) / 2
+    return np.unique(np.quantile(values, np.linspace(0, 1, max_bins + 1)[1:-1]))
+
+
+class DriftProfile:
+    """Per-feature bin edges and counts; every feature has MAX_BINS bins, unused ones padded with +inf edges
+
+    Each feature is mapped monotonically into its own interval [2j, 2j + 1], so
+    one searchsorted over the concatenated edges bins a whole feature matrix.
+    """
+
+    def __init__(self, edges, counts=None, features=None):
+        self.edges = edges
+        self.features = list(features or get_feature_columns())
+        n_features, n_edges = edges.shape
+        self.counts = np.zeros((n_features, n_edges + 1), dtype=np.int64) if counts is None else counts
+
+        finite = np.isfinite(edges)
+        padded = np.where(finite, edges, -np.inf)
+        self._low = np.where(finite[:, 0], edges[:, 0], 0.0) - 1
+        self._scale = 1 / (np.where(finite[:, 0], padded.max(axis=1), 0.0) + 1 - self._low)
+        self._base = 2.0 * np.arange(n_features)
+        self._keys = (np.where(finite, (edges - self._low[:, None]) * self._scale[:, None], 1.5)
+                      + self._base[:, None]).ravel()
+        # searchsorted counts n_edges per earlier feature, counts rows hold n_edges + 1 bins
+        self._offsets = np.arange(n_features)
+
+    @classmethod
+    def fit(cls, X, max_bins=MAX_BINS):
+        edges = np.full((X.shape[1], max_bins - 1), np.inf)
+        for j in range(X.shape[1]):
+            inner = bin_edges(np.asarray(X[:, j], dtype=np.float64), max_bins)
+            edges[j, :len(inner)] = inner
+        profile = cls(edges)
+        profile.add(X)
+        return profile
+
+    @classmethod
+    def load(cls, path=REFERENCE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['edges'], data['counts'], data['features'].tolist())
+
+    def save(self, path=REFERENCE_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, edges=self.edges, counts=self.counts, features=np.array(self.features))
+        os.replace(tmp_path, path)
+
+    @property
+    def rows(self):
+        return int(self.counts[0].sum())
+
+    def empty_like(self):
+        return DriftProfile(self.edges, features=self.features)
+
+    def bin_counts(self, X):
+        """(features, bins) histogram of a feature matrix; NaN falls in the lowest bin"""
+        keys = np.fmin(np.fmax((np.asarray(X) - self._low) * self._scale, 0.0), 1.0)
+        keys += self._base
+        bins = np.searchsorted(self._keys, keys, side='right') + self._offsets
+        return np.bincount(bins.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+
+    def add(self, X):
+        self.counts += self.bin_counts(X)
+
+
+def _proportions(counts):
+    totals = counts.sum(axis=1, keepdims=True)
+    return counts / np.maximum(totals, 1)
+
+
+def compare(reference, current):
+    """PSI and binned Kolmogorov-Smirnov statistic per feature"""
+    p = _proportions(current.counts)
+    q = _proportions(reference.counts)
+    p_floor, q_floor = np.maximum(p, _PSI_FLOOR), np.maximum(q, _PSI_FLOOR)
+    psi = ((p_floor - q_floor) * np.log(p_floor / q_floor)).sum(axis=1)
+    ks = np.abs(np.cumsum(p, axis=1) - np.cumsum(q, axis=1)).max(axis=1)
+    return psi, ks
+
+
+class DriftMonitor:
+    """Accumulate live feature histograms against a reference profile in constant memory"""
+
+    def __init__(self, reference=None, min_rows=MIN_ROWS, psi_warn=PSI_WARN, psi_alert=PSI_ALERT):
+        self.reference = DriftProfile.load() if reference is None else reference
+        self.current = self.reference.empty_like()
+        self.min_rows = min_rows
+        self.psi_warn = psi_warn
+        self.psi_alert = psi_alert
+        self.seen = 0
+        self._alerting = set()
+        self._lock = threading.Lock()
+
+    def update(self, X):
+        """Add a scored batch's feature matrix (sampled down to SAMPLE_ROWS rows)"""
+        rows = len(X)
+        with metrics.timer('drift_update'):
+            if len(X) > SAMPLE_ROWS:
+                X = X[::-(-len(X) // SAMPLE_ROWS)]
+            counts = self.current.bin_counts(X)
+            with self._lock:
+                self.current.counts += counts
+                self.seen += rows
+
+    def reset(self):
+        with self._lock:
+            self.current = self.reference.empty_like()
+            self.seen = 0
+            self._alerting.clear()
+
+    def report(self):
+        """Per-feature PSI, KS and status (ok / warn / alert), worst first"""
+        with self._lock:
+            current = DriftProfile(self.current.edges, self.current.counts.copy(), self.current.features)
+            seen = self.seen
+        psi, ks = compare(self.reference, current)
+        rows = current.rows
+        report = []
+        for feature, feature_psi, feature_ks in zip(current.features, psi, ks):
+            status = 'ok'
+            if rows >= self.min_rows:
+                status = 'alert' if feature_psi >= self.psi_alert else 'warn' if feature_psi >= self.psi_warn else 'ok'
+            report.append({'feature': feature, 'psi': float(feature_psi), 'ks': float(feature_ks), 'status': status})
+        # Count each feature once when it crosses into alert; concurrent reports must not both count it
+        alerting = {entry['feature'] for entry in report if entry['status'] == 'alert'}
+        with self._lock:
+            crossed = alerting - self._alerting
+            self._alerting = alerting
+        for feature in crossed:
+            metrics.count('drift_alerts', feature=feature)
+        return {'rows': rows, 'seen': seen, 'features': sorted(report, key=lambda entry: -entry['psi'])}
+
+    def alerts(self):
+        return [entry for entry in self.report()['features'] if entry['status'] == 'alert']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the drift reference profile or check a booking file against it")
+    parser.add_argument('command', choices=['build', 'check'])
+    parser.add_argument('source', nargs='?', default='data/preprocessed_data.csv', help="booking CSV")
+    parser.add_argument('--reference', default=REFERENCE_PATH)
+    args = parser.parse_args(argv)
+
+    from src.batch_score import read_bookings, chunk_features
+
+    if args.command == 'build':
+        chunks = [chunk_features(chunk) for chunk in read_bookings(args.source, 500_000)]
+        profile = DriftProfile.fit(np.concatenate(chunks))
+        profile.save(args.reference)
+        print(f"Reference profile of {profile.rows:,} bookings -> {args.reference}")
+        return 0
+
+    monitor = DriftMonitor(DriftProfile.load(args.reference))
+    for chunk in read_bookings(args.source, 500_000):
+        monitor.update(chunk_features(chunk))
+    report = monitor.report()
+    print(json.dumps(report, indent=2))
+    return 1 if any(entry['status'] == 'alert' for entry in report['features']) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import weakref
+
+import numpy as np
+
+from src import metrics
+from src.feature_eng import get_feature_columns
+from src.scoring import classify, uses_scaled_features
+
+TOP_K = 3
+FACTOR_ID_DTYPE = np.int16
+FACTOR_VALUE_DTYPE = np.float32
+
+# Rows explained together; bounds the (rows x trees) leaf-index working set
+ROW_BLOCK = 4096
+# Blocks this small sum their leaf vectors directly, which also keeps scipy out of single-booking processes
+DENSE_ROWS = 64
+# Batches with more distinct rows than this share are explained in full; deduplicating would save little
+DISTINCT_SHARE = 0.9
+
+# Features summarized by each row of the app's booking profile table
+PROFILE_FEATURES = {
+    'Customer Type': ['num_passengers', 'is_group_travel', 'is_solo_traveler', 'passengers_per_day',
+                      'duration_per_passenger'],
+    'Booking Behavior': ['purchase_lead', 'planning_ratio', 'booking_urgency_encoded', 'last_minute_complex'],
+    'Service Preference': ['wants_extra_baggage', 'wants_preferred_seat', 'wants_in_flight_meals', 'total_extras',
+                           'high_engagement', 'is_premium_customer', 'no_extras'],
+    'Trip Type': ['trip_type_encoded', 'trip_complexity', 'length_of_stay', 'is_short_trip', 'is_extended_stay'],
+}
+
+
+class TreeContributions:
+    """Per-feature contributions of a tree ensemble from the leaves each row reaches
+
+    At every split the change in node value is credited to the split feature, so
+    each leaf carries a fixed contribution vector. A row's contributions are the
+    sum of its leaves' vectors: one sparse (rows x leaves) product per block,
+    and they add up to the raw score minus the summed root values.
+    """
+
+    def __init__(self, table, bias, sigmoid, leaves, offsets=None):
+        self.table = table
+        self.bias = bias
+        self.sigmoid = sigmoid
+        self._leaves = leaves
+        self._offsets = offsets
+
+    @classmethod
+    def from_lightgbm(cls, model):
+        from src.tree_model import binary_sigmoid
+
+        booster = model.booster_
+        dump = booster.dump_model()
+        n_features = len(dump['feature_names'])
+        max_leaves = max(tree['num_leaves'] for tree in dump['tree_info'])
+        table = np.zeros((len(dump['tree_info']) * max_leaves, n_features))
+        bias = 0.0
+        for t, tree in enumerate(dump['tree_info']):
+            root = tree['tree_structure']
+            if 'leaf_value' in root:
+                bias += root['leaf_value']
+                continue
+            bias += root['internal_value']
+            stack = [(root, np.zeros(n_features))]
+            while stack:
+                node, path = stack.pop()
+                for child in (node['left_child'], node['right_child']):
+                    is_leaf = 'leaf_value' in child
+                    child_path = path.copy()
+                    child_path[node['split_feature']] += \
+                        (child['leaf_value'] if is_leaf else child['internal_value']) - node['internal_value']
+                    if is_leaf:
+                        table[t * max_leaves + child['leaf_index']] = child_path
+                    else:
+                        stack.append((child, child_path))
+        offsets = np.arange(len(dump['tree_info'])) * max_leaves
+        return cls(table, bias, binary_sigmoid(dump), lambda X: booster.predict(X, pred_leaf=True), offsets)
+
+    @classmethod
+    def from_compiled(cls, ensemble):
+        table = np.zeros((len(ensemble.feature), ensemble.n_features_in_))
+        # Children are always stored after their parent, so one forward pass fills every path
+        for node in np.flatnonzero(ensemble.feature >= 0):
+            feature = ensemble.feature[node]
+            for child in (ensemble.left[node], ensemble.left[node] + 1):
+                table[child] = table[node]
+                table[child, feature] += ensemble.value[child] - ensemble.value[node]
+        bias = float(ensemble.value[ensemble.roots].sum())
+        return cls(table, bias, ensemble.sigmoid, ensemble.apply)
+
+    def contributions(self, X):
+        """Raw score (log-odds) and per-feature contributions, shapes (rows,) and (rows, features)"""
+        X = np.asarray(X)
+        contributions = np.empty((len(X), self.table.shape[1]))
+        for start in range(0, len(X), ROW_BLOCK):
+            leaves = self._leaves(X[start:start + ROW_BLOCK])
+            if self._offsets is not None:
+                leaves = leaves + self._offsets
+            rows, trees = leaves.shape
+            if rows <= DENSE_ROWS:
+                contributions[start:start + rows] = self.table[leaves].sum(axis=1)
+                continue
+            import scipy.sparse
+
+            onehot = scipy.sparse.csr_matrix(
+                (np.ones(leaves.size), leaves.ravel(), np.arange(0, leaves.size + 1, trees)),
+                shape=(rows, len(self.table)))
+            contributions[start:start + rows] = onehot @ self.table
+        return self.bias + contributions.sum(axis=1), contributions
+
+
+class LinearContributions:
+    """Coefficient times scaled feature value for logistic regression"""
+
+    def __init__(self, model, scaler):
+        self.coef = np.asarray(model.coef_, dtype=np.float64)[0]
+        self.bias = float(np.ravel(model.intercept_)[0])
+        self.sigmoid = 1.0
+        self.scaler = scaler
+
+    def contributions(self, X):
+        contributions = self.scaler.transform(X) * self.coef
+        return self.bias + contributions.sum(axis=1), contributions
+
+
+_EXPLAINERS = weakref.WeakKeyDictionary()
+
+
+def get_explainer(model, scaler=None):
+    """Contribution explainer for a model, built once per model object"""
+    explainer = _EXPLAINERS.get(model)
+    if explainer is None:
+        from src.tree_model import CompiledEnsemble
+
+        if isinstance(model, CompiledEnsemble):
+            explainer = TreeContributions.from_compiled(model)
+        elif hasattr(model, 'booster_'):
+            explainer = TreeContributions.from_lightgbm(model)
+        elif uses_scaled_features(model):
+            explainer = LinearContributions(model, scaler)
+        else:
+            raise TypeError(f"Cannot explain {type(model).__name__} predictions")
+        _EXPLAINERS[model] = explainer
+    return explainer
+
+
+def explain_features(model, scaler, X):
+    """Raw score and per-feature log-odds contributions for a feature matrix"""
+    with metrics.timer('explain'):
+        return get_explainer(model, scaler).contributions(X)
+
+
+def top_factors(contributions, k=TOP_K):
+    """Feature ids (int16) and contributions (float32) of the k largest |contributions| per row"""
+    k = min(k, contributions.shape[1])
+    candidates = np.argpartition(-np.abs(contributions), k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(contributions, candidates, axis=1)
+    order = np.argsort(-np.abs(values), axis=1)
+    return (np.take_along_axis(candidates, order, axis=1).astype(FACTOR_ID_DTYPE),
+            np.take_along_axis(values, order, axis=1).astype(FACTOR_VALUE_DTYPE))
+
+
+def distinct_rows(X):
+    """Distinct rows of a feature matrix in order of first appearance, and each row's index into them"""
+    X = np.ascontiguousarray(X)
+    keys = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # Keeping input order keeps the leaf lookups as cache-friendly as on the full matrix
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return X[first[order]], rank[inverse.ravel()]
+
+
+def score_and_contributions(model, scaler, X):
+    """score_features plus every per-feature contribution, from one pass over the ensemble"""
+    explainer = get_explainer(model, scaler)
+    with metrics.timer('explain'):
+        raw, contributions = explainer.contributions(X)
+    probability = 1.0 / (1.0 + np.exp(-explainer.sigmoid * raw))
+    prediction, confidence = classify(probability)
+    return prediction, probability, confidence, contributions
+
+
+def score_and_explain(model, scaler, X, k=TOP_K):
+    """score_features plus the top-k factors, taking probabilities from the explained leaves
+
+    Repeated feature rows (the same normalized booking) are explained once and share their factors.
+    """
+    X = np.asarray(X)
+    inverse = None
+    if len(X) > DENSE_ROWS:
+        distinct, inverse = distinct_rows(X)
+        if len(distinct) > DISTINCT_SHARE * len(X):
+            inverse = None
+        else:
+            X = distinct
+    prediction, probability, confidence, contributions = score_and_contributions(model, scaler, X)
+    factor_ids, factor_values = top_factors(contributions, k)
+    if inverse is None:
+        return prediction, probability, confidence, factor_ids, factor_values
+    return (prediction[inverse], probability[inverse], confidence[inverse], factor_ids[inverse],
+            factor_values[inverse])
+
+
+def factor_columns(factor_ids, factor_values):
+    """Output columns factor_<i> (feature name) and factor_<i>_contribution for batch scoring"""
+    names = np.asarray(get_feature_columns(), dtype=object)
+    columns = {}
+    for i in range(factor_ids.shape[1]):
+        columns[f'factor_{i + 1}'] = names[factor_ids[:, i]]
+        columns[f'factor_{i + 1}_contribution'] = factor_values[:, i].round(4)
+    return columns
+
+
+def feature_label(name):
+    return name.removesuffix('_encoded').replace('_', ' ').capitalize()
+
+
+def describe_factors(factor_ids, factor_values, row):
+    """One booking's factors as dicts of feature, label, booking value and contribution"""
+    names = get_feature_columns()
+    return [
+        {'feature': names[i], 'label': feature_label(names[i]), 'value': float(row[i]), 'contribution': float(value)}
+        for i, value in zip(factor_ids, factor_values)
+    ]
+
+
+def profile_contributions(contributions):
+    """Summed contribution of each booking profile row for one booking"""
+    index = {name: i for i, name in enumerate(get_feature_columns())}
+    return {category: float(sum(contributions[index[name]] for name in features))
+            for category, features in PROFILE_FEATURES.items()}
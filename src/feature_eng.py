@@ -1,10 +1,15 @@
-import pandas as pd
 import numpy as np
 
+from src.booking import TRIP_TYPES
+from src.metrics import timed
+from src.route_stats import default_route_stats
+
 # Feature engineering function
-def engineer_features(df):
+@timed('feature_engineering', rows=lambda df, *args, **kwargs: len(df))
+def engineer_features(df, route_stats=None):
     """Apply the same feature engineering as in training"""
-    
+    import pandas as pd
+
     # Temporal Features
     df['booking_urgency'] = pd.cut(df['purchase_lead'], 
                                     bins=[-1, 7, 30, 90, np.inf],
@@ -46,10 +51,10 @@ def engineer_features(df):
         (df['trip_type'] == 'CircleTrip').astype(int) * 2
     )
     
-    # Route Features
-    
-    df['route_frequency'] = 100
-    df['is_popular_route'] = 1
+    # Route Features (per-route booking counts from the training data)
+    if route_stats is None:
+        route_stats = default_route_stats()
+    df['route_frequency'], df['is_popular_route'], _ = route_stats.lookup_many(df['route'])
     
     # Interaction Features
     df['passengers_per_day'] = df['num_passengers'] / (df['length_of_stay'] + 1)
@@ -84,3 +89,122 @@ def get_feature_columns():
         'sales_channel_encoded', 'trip_type_encoded', 
         'booking_urgency_encoded', 'flight_time_category_encoded'
     ]
+
+
+# Column order of get_feature_columns(), used to address the feature matrix
+_FEATURE_INDEX = {name: i for i, name in enumerate(get_feature_columns())}
+
+# Lookup tables indexed by flight hour; index 24 catches hours outside 0-23
+_HOUR_CATEGORY_LUT = np.array([3] * 5 + [0] * 7 + [1] * 5 + [2] * 4 + [3] * 3 + [3], dtype=np.float32)
+_HOUR_INCONVENIENT_LUT = np.array([1] * 6 + [0] * 16 + [1] * 2 + [0], dtype=np.float32)
+_HOUR_EDGES = np.array([5, 12, 17, 21])
+_HOUR_EDGE_CATEGORY = np.array([3, 0, 1, 2, 3], dtype=np.float32)
+
+# Lookup table indexed by purchase lead (0-91, longer leads clipped to 91)
+_URGENCY_EDGES = np.array([7, 30, 90])
+_URGENCY_LUT = np.searchsorted(_URGENCY_EDGES, np.arange(92), side='left').astype(np.float32)
+
+
+def _hour_features(hour):
+    """Flight time category and inconvenient-hour flag for each flight hour"""
+    if np.issubdtype(hour.dtype, np.integer):
+        idx = np.where((hour >= 0) & (hour < 24), hour, 24)
+        return _HOUR_CATEGORY_LUT[idx], _HOUR_INCONVENIENT_LUT[idx]
+    category = _HOUR_EDGE_CATEGORY[np.searchsorted(_HOUR_EDGES, hour, side='right')]
+    whole = hour == np.floor(hour)
+    inconvenient = whole & (((hour >= 0) & (hour < 6)) | ((hour >= 22) & (hour < 24)))
+    return category, inconvenient
+
+
+def _urgency(lead):
+    """Booking urgency bucket, matching pd.cut(bins=[-1, 7, 30, 90, inf])"""
+    if (lead <= -1).any():
+        raise ValueError("purchase_lead must be greater than -1")
+    if np.issubdtype(lead.dtype, np.integer):
+        return _URGENCY_LUT[np.minimum(lead, 91)]
+    return np.searchsorted(_URGENCY_EDGES, lead, side='left')
+
+
+@timed('feature_engineering', rows=lambda data, *args, **kwargs: len(data['num_passengers']))
+def engineer_feature_matrix(data, out=None, route_stats=None):
+    """Compute get_feature_columns() into a C-contiguous float32 matrix without mutating data
+
+    `data` is anything indexable by column name (DataFrame, dict of arrays, BOOKING_DTYPE array);
+    sales_channel and trip_type may be strings or src.booking category codes.
+    Pass a preallocated (n, 31) float32 `out` to reuse its memory across chunks.
+    """
+    num_passengers = np.asarray(data['num_passengers'])
+    purchase_lead = np.asarray(data['purchase_lead'])
+    length_of_stay = np.asarray(data['length_of_stay'])
+    flight_hour = np.asarray(data['flight_hour'])
+    flight_day = np.asarray(data['flight_day'])
+    flight_duration = np.asarray(data['flight_duration'])
+    baggage = np.asarray(data['wants_extra_baggage'])
+    seat = np.asarray(data['wants_preferred_seat'])
+    meals = np.asarray(data['wants_in_flight_meals'])
+    sales_channel = np.asarray(data['sales_channel'])
+    trip_type = np.asarray(data['trip_type'])
+    if route_stats is None:
+        route_stats = default_route_stats()
+
+    n = len(num_passengers)
+    if out is None:
+        out = np.empty((n, len(_FEATURE_INDEX)), dtype=np.float32)
+    elif out.shape != (n, len(_FEATURE_INDEX)) or out.dtype != np.float32 or not out.flags.c_contiguous:
+        raise ValueError(f"out must be a C-contiguous float32 array of shape ({n}, {len(_FEATURE_INDEX)})")
+    col = {name: out[:, i] for name, i in _FEATURE_INDEX.items()}
+
+    # Original Features
+    col['num_passengers'][:] = num_passengers
+    col['purchase_lead'][:] = purchase_lead
+    col['length_of_stay'][:] = length_of_stay
+    col['flight_hour'][:] = flight_hour
+    col['flight_day'][:] = flight_day
+    col['flight_duration'][:] = flight_duration
+    col['wants_extra_baggage'][:] = baggage
+    col['wants_preferred_seat'][:] = seat
+    col['wants_in_flight_meals'][:] = meals
+
+    # Temporal Features
+    col['booking_urgency_encoded'][:] = _urgency(purchase_lead)
+    col['is_weekend_flight'][:] = (flight_day == 6) | (flight_day == 7)
+    col['flight_time_category_encoded'][:], col['inconvenient_flight_time'][:] = _hour_features(flight_hour)
+
+    # Behavioral Features
+    total_extras = col['total_extras']
+    np.add(col['wants_extra_baggage'], col['wants_preferred_seat'], out=total_extras)
+    total_extras += col['wants_in_flight_meals']
+    np.greater_equal(total_extras, 2, out=col['high_engagement'])
+    np.equal(total_extras, 3, out=col['is_premium_customer'])
+    np.equal(total_extras, 0, out=col['no_extras'])
+
+    # Trip Complexity Features
+    np.greater_equal(col['num_passengers'], 3, out=col['is_group_travel'])
+    np.equal(col['num_passengers'], 1, out=col['is_solo_traveler'])
+    col['is_long_haul'][:] = flight_duration > 6
+    np.less_equal(col['length_of_stay'], 3, out=col['is_short_trip'])
+    np.greater(col['length_of_stay'], 14, out=col['is_extended_stay'])
+
+    trip_type_codes = trip_type.dtype.kind in 'iu'
+    is_circle_trip = trip_type == (TRIP_TYPES.index('CircleTrip') if trip_type_codes else 'CircleTrip')
+    complexity = col['trip_complexity']
+    np.add(col['is_group_travel'], col['is_long_haul'], out=complexity)
+    complexity += col['is_extended_stay']
+    complexity += 2 * is_circle_trip
+
+    # Route Features
+    col['route_frequency'][:], col['is_popular_route'][:], _ = route_stats.lookup_many(data['route'])
+
+    # Interaction Features (computed in float64 before narrowing, as in engineer_features)
+    stay = length_of_stay + 1
+    col['passengers_per_day'][:] = num_passengers / stay
+    col['planning_ratio'][:] = purchase_lead / stay
+    col['duration_per_passenger'][:] = flight_duration / num_passengers
+    col['last_minute_complex'][:] = (purchase_lead < 7) & (complexity >= 2)
+
+    # Encode categorical variables
+    # Booking record codes already are the encodings
+    col['sales_channel_encoded'][:] = sales_channel if sales_channel.dtype.kind in 'iu' else sales_channel == 'Mobile'
+    col['trip_type_encoded'][:] = trip_type if trip_type_codes else (trip_type == 'OneWay') + 2 * is_circle_trip
+
+    return out
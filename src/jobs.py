@@ -0,0 +1,343 @@
+import argparse
+import json
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+
+from src import metrics
+
+JOBS_PATH = os.environ.get('BA_JOBS_DB', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                      'data', 'jobs.db'))
+
+ACTIONS = ('follow_up_email', 'support_call', 'incentive_code', 'follow_up_list')
+# Queued for every HIGH-risk booking by src.batch_score --enqueue
+HIGH_RISK_ACTIONS = ('follow_up_email', 'incentive_code')
+
+INCENTIVE_DISCOUNT = 10
+# No 0/O or 1/I, so codes survive being read out over the phone
+CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+CODE_LENGTH = 8
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_WORKERS = 2
+MAX_ATTEMPTS = 3
+# Running jobs older than this belong to a crashed worker and are handed out again
+STALE_AFTER = 300.0
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+QUERY_CHUNK = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    action TEXT NOT NULL,
+    booking_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS incentive_codes (
+    code TEXT PRIMARY KEY,
+    booking_id TEXT NOT NULL UNIQUE,
+    discount INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+'''
+
+
+def new_booking_id():
+    """Reference for a booking entered in the app, which has no booking reference of its own"""
+    return f"app-{secrets.token_hex(10)}"
+
+
+def row_ids(chunk, source):
+    """Booking ids for a chunk of a booking file: its booking_id column, else the file digest plus row number
+
+    Identical rows stay separate bookings, and re-running the same file maps
+    every row to the same jobs.
+    """
+    if 'booking_id' in chunk:
+        return chunk['booking_id'].astype(str).tolist()
+    return [f"{source}:{row}" for row in chunk.index]
+
+
+def new_code():
+    body = ''.join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+    return f"BA-{body[:4]}-{body[4:]}"
+
+
+def _chunks(items, size=QUERY_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class JobQueue:
+    """Durable follow-up action queue in a local SQLite file
+
+    Each thread gets its own connection; WAL mode lets the app and batch
+    scorer enqueue while workers claim. A job's idempotency key is
+    action:booking_id, so enqueueing the same action twice is a no-op.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql, rows):
+        """executemany in one transaction; returns the number of rows changed"""
+        conn = self._connect()
+        before = conn.total_changes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(sql, rows)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return conn.total_changes - before
+
+    def enqueue(self, action, items):
+        """Queue (booking_id, payload) pairs for an action in one batched insert; returns how many were new"""
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action {action!r}")
+        now = time.time()
+        rows = [(f"{action}:{booking}", action, booking, json.dumps(payload), now, now) for booking, payload in items]
+        with metrics.timer('jobs_enqueue'):
+            inserted = self._write('INSERT OR IGNORE INTO jobs (idempotency_key, action, booking_id, payload, '
+                                   'created, updated) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        metrics.count('jobs_enqueued', inserted, action=action)
+        return inserted
+
+    def issue_codes(self, booking_ids, discount=INCENTIVE_DISCOUNT):
+        """Incentive code per booking id, creating unique codes for bookings that have none yet"""
+        conn = self._connect()
+        booking_ids = list(dict.fromkeys(booking_ids))
+        codes = {}
+        while len(codes) < len(booking_ids):
+            now = time.time()
+            missing = [booking for booking in booking_ids if booking not in codes]
+            # Existing bookings keep their code and a colliding code is ignored, then retried on the next pass
+            self._write('INSERT OR IGNORE INTO incentive_codes (code, booking_id, discount, created) '
+                        'VALUES (?, ?, ?, ?)', [(new_code(), booking, discount, now) for booking in missing])
+            for chunk in _chunks(missing):
+                codes.update(conn.execute(
+                    f"SELECT booking_id, code FROM incentive_codes WHERE booking_id IN ({','.join('?' * len(chunk))})",
+                    chunk))
+        return codes
+
+    def claim(self, limit=DEFAULT_BATCH_SIZE):
+        """Atomically mark up to limit pending jobs as running; returns (id, action, booking_id, payload) rows"""
+        conn = self._connect()
+        return conn.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ? "
+            "WHERE id IN (SELECT id FROM jobs WHERE status = 'pending' ORDER BY id LIMIT ?) "
+            "RETURNING id, action, booking_id, payload", (time.time(), limit)).fetchall()
+
+    def complete(self, results):
+        """Mark (id, result) pairs done"""
+        now = time.time()
+        return self._write("UPDATE jobs SET status = 'done', result = ?, error = NULL, updated = ? WHERE id = ?",
+                           [(result, now, job) for job, result in results])
+
+    def fail(self, ids, error, max_attempts=MAX_ATTEMPTS):
+        """Return jobs to the queue, or mark them failed once they have used max_attempts"""
+        now = time.time()
+        return self._write("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                           "error = ?, updated = ? WHERE id = ?", [(max_attempts, error, now, job) for job in ids])
+
+    def requeue_stale(self, older_than=STALE_AFTER):
+        return self._write("UPDATE jobs SET status = 'pending' WHERE status = 'running' AND updated < ?",
+                           [(time.time() - older_than,)])
+
+    def counts(self):
+        """Jobs per action and status"""
+        counts = {}
+        for action, status, n in self._connect().execute(
+                'SELECT action, status, COUNT(*) FROM jobs GROUP BY action, status'):
+            counts.setdefault(action, {})[status] = n
+        return counts
+
+
+def enqueue_bookings(jobs, chunk, scored, source, tier='HIGH', actions=HIGH_RISK_ACTIONS):
+    """Queue follow-up actions for the bookings of a scored chunk in one risk tier; returns jobs added
+
+    source identifies the booking file (see row_ids); chunk keeps the file's row numbers as its index.
+    """
+    selected = (scored['risk_tier'] == tier).to_numpy()
+    if not selected.any():
+        return 0
+    ids = row_ids(chunk[selected], source)
+    probabilities = scored.loc[selected, 'probability'].to_numpy().tolist()
+    codes = jobs.issue_codes(ids) if 'incentive_code' in actions else {}
+    added = 0
+    for action in actions:
+        items = []
+        for booking, probability in zip(ids, probabilities):
+            payload = {'probability': probability, 'risk_tier': tier}
+            if action == 'incentive_code':
+                payload.update(code=codes[booking], discount=INCENTIVE_DISCOUNT)
+            items.append((booking, payload))
+        added += jobs.enqueue(action, items)
+    return added
+
+
+def _deliver(jobs):
+    """Stand-in for the email, telephony and CRM integrations: records the delivery time"""
+    delivered = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    return [json.dumps({'delivered': delivered}) for _ in jobs]
+
+
+# action -> callable taking a list of (id, action, booking_id, payload) rows and returning one result per row
+HANDLERS = {action: _deliver for action in ACTIONS}
+
+
+class WorkerPool:
+    """Threads that claim jobs in batches and run the action handlers
+
+    A batch whose handler raises goes back to the queue (up to MAX_ATTEMPTS);
+    jobs left running by a crashed worker are requeued when a pool starts.
+    """
+
+    def __init__(self, jobs, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE, poll_interval=0.5,
+                 handlers=HANDLERS):
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.handlers = handlers
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._drain = False
+        self._started = None
+        self._threads = [threading.Thread(target=self._run, name=f'jobs-{i}', daemon=True) for i in range(workers)]
+
+    def start(self):
+        self.jobs.requeue_stale()
+        self._started = time.perf_counter()
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def drain(self):
+        """Process until nothing is pending, then stop; returns stats()"""
+        self._drain = True
+        if self._started is None:
+            self.start()
+        for thread in self._threads:
+            thread.join()
+        return self.stats()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                rows = self.jobs.claim(self.batch_size)
+                self._busy += bool(rows)
+            if not rows:
+                # A draining pool stops once no worker still has a batch that could fail back into the queue
+                with self._lock:
+                    idle = self._busy == 0
+                if self._drain and idle:
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                self._process(rows)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+    def _process(self, rows):
+        by_action = {}
+        for row in rows:
+            by_action.setdefault(row[1], []).append(row)
+        for action, batch in by_action.items():
+            ids = [row[0] for row in batch]
+            try:
+                with metrics.timer('jobs_batch'):
+                    results = self.handlers[action](batch)
+                    self.jobs.complete(zip(ids, results))
+            except Exception as exc:
+                self.jobs.fail(ids, f"{type(exc).__name__}: {exc}")
+                metrics.count('jobs_failed', len(ids), action=action)
+                with self._lock:
+                    self.failed += len(ids)
+                continue
+            metrics.count('jobs_processed', len(ids), action=action)
+            with self._lock:
+                self.processed += len(ids)
+                self.batches += 1
+
+    def stats(self):
+        seconds = time.perf_counter() - self._started if self._started is not None else 0.0
+        with self._lock:
+            return {
+                'processed': self.processed,
+                'failed': self.failed,
+                'batches': self.batches,
+                'seconds': seconds,
+                'jobs_per_sec': self.processed / seconds if seconds else 0.0,
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Durable follow-up action queue")
+    sub = parser.add_subparsers(dest='command', required=True)
+    work_cmd = sub.add_parser('work', help="process queued jobs in batches")
+    work_cmd.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    work_cmd.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    work_cmd.add_argument('--drain', action='store_true', help="exit once the queue is empty")
+    sub.add_parser('status', help="jobs per action and status")
+    parser.add_argument('--db', default=JOBS_PATH)
+    args = parser.parse_args(argv)
+
+    jobs = JobQueue(args.db)
+    if args.command == 'status':
+        print(json.dumps(jobs.counts(), indent=2))
+        return 0
+    pool = WorkerPool(jobs, args.workers, args.batch_size)
+    if args.drain:
+        stats = pool.drain()
+    else:
+        pool.start()
+        try:
+            while True:
+                time.sleep(10)
+                stats = pool.stats()
+                print(f"{stats['processed']:,} jobs, {stats['jobs_per_sec']:,.0f} jobs/s", file=sys.stderr)
+        except KeyboardInterrupt:
+            pool.stop()
+            stats = pool.stats()
+    print(f"Processed {stats['processed']:,} jobs in {stats['batches']:,} batches ({stats['failed']:,} failed) "
+          f"in {stats['seconds']:.1f}s, {stats['jobs_per_sec']:,.0f} jobs/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
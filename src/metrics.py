@@ -0,0 +1,210 @@
+import bisect
+import contextlib
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# Set BA_METRICS=0 to turn instrumentation into no-ops
+ENABLED = os.environ.get('BA_METRICS', '1') != '0'
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with running count and sum"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value, n=1):
+        self.counts[bisect.bisect_left(self.buckets, value)] += n
+        self.count += n
+        self.sum += value * n
+
+    def observe_many(self, values):
+        """Add a batch of observations in one vectorized pass"""
+        values = np.asarray(values, dtype=np.float64)
+        indices = np.searchsorted(self.buckets, values, side='left')
+        for i, n in enumerate(np.bincount(indices, minlength=len(self.counts))):
+            self.counts[i] += int(n)
+        self.count += len(values)
+        self.sum += float(values.sum())
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket that holds it"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = list(itertools.accumulate(self.counts))
+        i = bisect.bisect_left(cumulative, rank)
+        lower = self.buckets[i - 1] if i > 0 else 0.0
+        upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+        below = cumulative[i - 1] if i > 0 else 0
+        inside = self.counts[i]
+        return lower + (upper - lower) * ((rank - below) / inside if inside else 0.0)
+
+
+class _Timer(contextlib.ContextDecorator):
+    __slots__ = ('registry', 'stage', 'start')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopTimer(contextlib.ContextDecorator):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+class Registry:
+    """Stage latency histograms and labelled counters"""
+
+    def __init__(self, prefix='ba'):
+        self.prefix = prefix
+        self.latency = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.latency.get(stage)
+            if histogram is None:
+                histogram = self.latency[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, stage):
+        """Context manager / decorator recording the wall-clock time of a stage"""
+        return _Timer(self, stage) if ENABLED else _NOOP
+
+    def count(self, name, n=1, **labels):
+        if not ENABLED:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.counters.clear()
+
+    def summary(self):
+        """Per-stage count, mean, p50 and p95 latency in milliseconds"""
+        with self._lock:
+            return [
+                {
+                    'stage': stage,
+                    'count': h.count,
+                    'mean_ms': 1e3 * h.sum / h.count if h.count else 0.0,
+                    'p50_ms': 1e3 * h.quantile(0.5),
+                    'p95_ms': 1e3 * h.quantile(0.95),
+                }
+                for stage, h in self.latency.items()
+            ]
+
+    def to_json(self):
+        with self._lock:
+            return json.dumps({
+                'latency_seconds': {
+                    stage: {
+                        'buckets': dict(zip([*map(str, h.buckets), '+Inf'], h.counts)),
+                        'count': h.count,
+                        'sum': h.sum,
+                    }
+                    for stage, h in self.latency.items()
+                },
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in self.counters.items()
+                ],
+            })
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            if self.latency:
+                name = f'{self.prefix}_stage_latency_seconds'
+                lines.append(f'# HELP {name} Wall-clock time per prediction pipeline stage.')
+                lines.append(f'# TYPE {name} histogram')
+                for stage, h in self.latency.items():
+                    cumulative = itertools.accumulate(h.counts)
+                    for bound, total in zip(h.buckets, cumulative):
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {total}')
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum:.9g}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+            typed = set()
+            for (counter, labels), value in sorted(self.counters.items()):
+                name = f'{self.prefix}_{counter}_total'
+                if name not in typed:
+                    lines.append(f'# TYPE {name} counter')
+                    typed.add(name)
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def timer(stage):
+    return REGISTRY.timer(stage)
+
+
+def timed(stage, rows=None):
+    """Decorator timing every call of a function; a single flag check when disabled
+
+    rows maps the call's arguments to its row count; multi-row calls are then
+    recorded as '<stage>_batch' so single-booking latency keeps its own histogram.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            name = stage if rows is None or rows(*args, **kwargs) == 1 else f"{stage}_batch"
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1, **labels):
+    REGISTRY.count(name, n, **labels)
+
+
+def count_risk_tiers(tier_codes, tiers):
+    """Count predictions per risk tier from an array of tier codes"""
+    if not ENABLED:
+        return
+    for tier, n in zip(tiers, np.bincount(np.asarray(tier_codes), minlength=len(tiers))):
+        if n:
+            REGISTRY.count('predictions', int(n), risk_tier=tier)
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import io
+import itertools
+import multiprocessing as mp
+import os
+import sys
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from src import metrics
+from src.batch_score import BOOKING_DTYPES, chunk_columns, scores_frame
+from src.feature_eng import engineer_feature_matrix, get_feature_columns
+from src.scoring import MODEL_DIR, load_model_and_scaler, score_features
+
+DEFAULT_CHUNKSIZE = 500_000
+
+# Two chunk slots: workers score one while the parent reads the next
+N_SLOTS = 2
+
+# The parent only moves bytes; everything between parsing and CSV formatting runs in the workers
+SERIAL_STAGES = ('parallel_read', 'parallel_wait', 'parallel_write')
+
+# Per-process state set up once by _init_worker
+_worker = {}
+
+
+def _attach(name):
+    # Spawned workers share the parent's resource tracker; the parent unlinks the segment
+    return SharedMemory(name=name)
+
+
+def _init_worker(feature_names, capacity, columns, model_dir, compiled, keep_input):
+    features = []
+    for name in feature_names:
+        shm = _attach(name)
+        features.append((shm, np.ndarray((capacity, len(get_feature_columns())), np.float32, buffer=shm.buf)))
+    model, scaler = load_model_and_scaler(model_dir, compiled=compiled)
+    if hasattr(model, 'set_params'):
+        # One thread per worker; the pool provides the parallelism
+        model.set_params(n_jobs=1)
+    _worker.update(features=features, raw={}, columns=columns, model=model, scaler=scaler, keep_input=keep_input)
+
+
+def _raw_bytes(slot, name, start, stop):
+    attached = _worker['raw'].get(slot)
+    if attached is None or attached.name != name:
+        # The parent grew this slot's segment for a larger chunk
+        if attached is not None:
+            attached.close()
+        attached = _worker['raw'][slot] = _attach(name)
+    return bytes(attached.buf[start:stop])
+
+
+def _score_slice(task):
+    """Parse, engineer, score and format one line-aligned slice of a chunk, returning its CSV bytes
+
+    The slice's features go to rows [row, row + n) of the slot's shared feature matrix.
+    """
+    slot, name, start, stop, row, header = task
+    chunk = pd.read_csv(io.BytesIO(_raw_bytes(slot, name, start, stop)), header=None, names=_worker['columns'],
+                        dtype=BOOKING_DTYPES, encoding='ISO-8859-1')
+    X = engineer_feature_matrix(chunk_columns(chunk), out=_worker['features'][slot][1][row:row + len(chunk)])
+    prediction, probability, confidence = score_features(_worker['model'], _worker['scaler'], X)
+    scored = scores_frame(chunk, prediction, probability, confidence)
+    if _worker['keep_input']:
+        scored = pd.concat([chunk, scored], axis=1)
+    return scored.to_csv(header=header, index=False).encode()
+
+
+def read_header(path):
+    """Column names from the first line of a booking file"""
+    with open(path, newline='', encoding='ISO-8859-1') as f:
+        return next(csv.reader(f))
+
+
+def read_blocks(f, chunksize):
+    """Yield (data, line_ends) for up to chunksize lines at a time from a binary file"""
+    while True:
+        lines = list(itertools.islice(f, chunksize))
+        if not lines:
+            return
+        yield b''.join(lines), np.cumsum([len(line) for line in lines])
+
+
+def slice_tasks(slot, name, line_ends, n_tasks, first):
+    """Split a block into about n_tasks line-aligned byte ranges"""
+    n = len(line_ends)
+    step = max(1, -(-n // n_tasks))
+    tasks = []
+    for row in range(0, n, step):
+        start = int(line_ends[row - 1]) if row else 0
+        stop = int(line_ends[min(row + step, n) - 1])
+        tasks.append((slot, name, start, stop, row, first and row == 0))
+    return tasks
+
+
+def score_file_parallel(input_path, output_path, workers=None, chunksize=DEFAULT_CHUNKSIZE, model_dir=MODEL_DIR,
+                        compiled=False, keep_input=True):
+    """Score a booking file into a CSV across a process pool and return the number of rows written
+
+    Workers parse, engineer, score and format their slice of each chunk; the
+    parent only reads raw lines into shared memory and writes the returned CSV
+    bytes in input order. Lines are split on newlines, so quoted fields must
+    not contain line breaks (true of customer_booking.csv).
+    """
+    workers = workers or os.cpu_count()
+    n_features = len(get_feature_columns())
+    features = []
+    raw = [None] * N_SLOTS
+    rows = 0
+    try:
+        for _ in range(N_SLOTS):
+            features.append(SharedMemory(create=True, size=chunksize * n_features * np.dtype(np.float32).itemsize))
+
+        ctx = mp.get_context('spawn')
+        initargs = ([shm.name for shm in features], chunksize, read_header(input_path), model_dir, compiled,
+                    keep_input)
+        with ctx.Pool(workers, initializer=_init_worker, initargs=initargs) as pool, \
+                open(input_path, 'rb') as f, open(output_path, 'wb') as out:
+            next(f)  # the header line; workers get the column names at start-up
+
+            def finish(result):
+                with metrics.timer('parallel_wait'):
+                    parts = result.get()
+                with metrics.timer('parallel_write'):
+                    out.writelines(parts)
+
+            pending = None
+            blocks = read_blocks(f, chunksize)
+            for i in itertools.count():
+                with metrics.timer('parallel_read'):
+                    block = next(blocks, None)
+                    if block is None:
+                        break
+                    data, line_ends = block
+                    slot = i % N_SLOTS
+                    if raw[slot] is None or raw[slot].size < len(data):
+                        # Tasks on this slot finished before its previous chunk was written
+                        if raw[slot] is not None:
+                            raw[slot].close()
+                            raw[slot].unlink()
+                        raw[slot] = SharedMemory(create=True, size=max(len(data), 1))
+                    raw[slot].buf[:len(data)] = data
+                tasks = slice_tasks(slot, raw[slot].name, line_ends, workers * 4, i == 0)
+                result = pool.map_async(_score_slice, tasks, chunksize=1)
+                if pending is not None:
+                    finish(pending)
+                pending = result
+                rows += len(line_ends)
+            if pending is not None:
+                finish(pending)
+    finally:
+        for shm in features + [shm for shm in raw if shm is not None]:
+            shm.close()
+            shm.unlink()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a booking file across a process pool")
+    parser.add_argument('input', help="CSV shaped like data/customer_booking.csv")
+    parser.add_argument('-o', '--output', required=True, help="output CSV")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--scores-only', action='store_true', help="write only the score columns")
+    parser.add_argument('--compiled', action='store_true', help="score with model/best_model.npz")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = score_file_parallel(args.input, args.output, args.workers, args.chunksize, compiled=args.compiled,
+                               keep_input=not args.scores_only)
+    seconds = time.perf_counter() - start
+    print(f"Scored {rows:,} rows with {args.workers} workers in {seconds:.1f}s "
+          f"({rows / max(seconds, 1e-9):,.0f} rows/sec)", file=sys.stderr)
+    spent = {stage.split('_')[1]: metrics.REGISTRY.latency[stage].sum for stage in SERIAL_STAGES
+             if stage in metrics.REGISTRY.latency}
+    if spent:
+        busy = spent.get('read', 0.0) + spent.get('write', 0.0)
+        print(f"Parent I/O: {busy:.2f}s ({busy / max(seconds, 1e-9):.0%} of wall time; read {spent.get('read', 0):.2f}s, "
+              f"write {spent.get('write', 0):.2f}s), waiting on workers {spent.get('wait', 0):.2f}s",
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+import argparse
+import collections
+import json
+import os
+import pickle
+import shutil
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+from src import metrics
+from src.dataset_store import file_sha256
+from src.route_stats import ROUTE_STATS_PATH, RouteStats, reload_route_stats
+from src.scoring import MODEL_DIR, load_model_and_scaler, score_features
+
+REGISTRY_DIR = os.path.join(MODEL_DIR, 'registry')
+CURRENT = 'CURRENT'
+MANIFEST = 'manifest.json'
+# One JSON line per replica that refused to serve a version
+REJECTIONS = 'rejections.jsonl'
+
+REQUIRED_FILES = ('best_model.pkl', 'scaler.pkl', 'feature_info.pkl')
+OPTIONAL_FILES = ('best_model.npz', 'route_stats.npy', 'training_report.json')
+
+CANARY_SOURCE = os.path.join(os.path.dirname(MODEL_DIR), 'data', 'customer_booking.csv')
+CANARY_ROWS = 512
+# A new version is rejected if scoring the canary batch takes longer than this multiple of the live version
+MAX_SLOWDOWN = 1.5
+WATCH_INTERVAL = 5.0
+
+
+class RegistryError(Exception):
+    """A model version is missing, corrupt or failed validation"""
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(name for name in os.listdir(registry_dir)
+                  if os.path.exists(os.path.join(registry_dir, name, MANIFEST)))
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """Version named by the CURRENT pointer, or None for an empty registry"""
+    try:
+        with open(os.path.join(registry_dir, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current(version, registry_dir=REGISTRY_DIR):
+    """Point CURRENT at a version; the rename is atomic, so watchers never read a partial name"""
+    if version not in list_versions(registry_dir):
+        raise RegistryError(f"Unknown model version {version!r}")
+    tmp_path = os.path.join(registry_dir, f'{CURRENT}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp_path, os.path.join(registry_dir, CURRENT))
+
+
+def record_rejection(version, detail, registry_dir=REGISTRY_DIR):
+    """Append a replica's rejection of a version; CURRENT is left to the operator"""
+    entry = {'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'version': version, 'host': socket.gethostname(),
+             'pid': os.getpid(), 'detail': detail}
+    with open(os.path.join(registry_dir, REJECTIONS), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def rejections(registry_dir=REGISTRY_DIR):
+    """Rejection entries per version"""
+    by_version = collections.defaultdict(list)
+    try:
+        with open(os.path.join(registry_dir, REJECTIONS)) as f:
+            for line in f:
+                entry = json.loads(line)
+                by_version[entry['version']].append(entry)
+    except FileNotFoundError:
+        pass
+    return by_version
+
+
+def publish(source_dir, registry_dir=REGISTRY_DIR, activate=False):
+    """Copy a model directory into the next version with sha256 checksums; returns the version"""
+    files = {}
+    for name in REQUIRED_FILES + OPTIONAL_FILES:
+        path = os.path.join(source_dir, name)
+        if not os.path.exists(path) and name == 'feature_info.pkl':
+            # Retraining keeps the feature set, so the shipped feature_info applies
+            path = os.path.join(MODEL_DIR, name)
+        if os.path.exists(path):
+            files[name] = path
+        elif name in REQUIRED_FILES:
+            raise RegistryError(f"{source_dir} has no {name}")
+
+    versions = list_versions(registry_dir)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+    staging = os.path.join(registry_dir, f'.{version}.tmp')
+    os.makedirs(staging)
+    for name, path in files.items():
+        shutil.copyfile(path, os.path.join(staging, name))
+    manifest = {
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'source': os.path.abspath(source_dir),
+        'files': {name: file_sha256(os.path.join(staging, name)) for name in files},
+    }
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(staging, os.path.join(registry_dir, version))
+    if activate:
+        set_current(version, registry_dir)
+    return version
+
+
+def verify(version_dir):
+    """Check every file against the manifest checksums"""
+    with open(os.path.join(version_dir, MANIFEST)) as f:
+        try:
+            manifest = json.load(f)
+            files = manifest['files'].items()
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            raise RegistryError(f"Unreadable manifest in {version_dir}: {exc!r}") from None
+    for name, digest in files:
+        path = os.path.join(version_dir, name)
+        if not os.path.exists(path) or file_sha256(path) != digest:
+            raise RegistryError(f"Checksum mismatch for {path}")
+    return manifest
+
+
+class ModelVersion:
+    """Loaded artifacts of one version; replaced as a whole, never mutated"""
+
+    def __init__(self, version, model, scaler, route_stats=None, feature_info_path=None):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.route_stats = route_stats
+        self._feature_info_path = feature_info_path
+        self._feature_info = None
+
+    @property
+    def feature_info(self):
+        """Training feature metadata, unpickled on first use because its label encoders import sklearn"""
+        if self._feature_info is None and self._feature_info_path is not None:
+            with open(self._feature_info_path, 'rb') as f:
+                self._feature_info = pickle.load(f)
+        return self._feature_info
+
+
+def load_version(version_dir, compiled=False):
+    """Verify and load a registry version (or a plain model directory without a manifest)"""
+    with metrics.timer('model_load'):
+        has_manifest = os.path.exists(os.path.join(version_dir, MANIFEST))
+        version = verify(version_dir)['version'] if has_manifest else os.path.basename(os.path.normpath(version_dir))
+        compiled = compiled and os.path.exists(os.path.join(version_dir, 'best_model.npz'))
+        model, scaler = load_model_and_scaler(version_dir, compiled=compiled)
+        route_stats_path = os.path.join(version_dir, 'route_stats.npy')
+        if not os.path.exists(route_stats_path):
+            # The shipped index as it is now, mapped for this version only; the process-wide
+            # default_route_stats() is refreshed when a version is promoted, not while it is evaluated
+            route_stats_path = ROUTE_STATS_PATH
+        route_stats = RouteStats.load(route_stats_path)
+        feature_info_path = os.path.join(version_dir, 'feature_info.pkl')
+        if not os.path.exists(feature_info_path):
+            feature_info_path = None
+    return ModelVersion(version, model, scaler, route_stats, feature_info_path)
+
+
+def warm_up(model, scaler, route_stats=None):
+    """Run the first-call paths (feature engineering, scoring, explainer build) on one synthetic booking
+
+    Called at boot and before a hot swap so the first real request does not
+    pay for lazy imports and one-off setup.
+    """
+    from src.booking import BookingRecord
+    from src.explain import explain_features
+    from src.feature_eng import engineer_feature_matrix
+
+    with metrics.timer('warm_up'):
+        booking = BookingRecord(1, 'Internet', 'RoundTrip', 30, 7, 12, 1, 'AKLDEL', 0, 0, 0, 8.0)
+        X = engineer_feature_matrix(booking.to_array(), route_stats=route_stats)
+        score_features(model, scaler, X)
+        explain_features(model, scaler, X)
+
+
+def canary_bookings(path=CANARY_SOURCE, rows=CANARY_ROWS):
+    import pandas as pd
+
+    from src.batch_score import BOOKING_DTYPES, map_flight_day
+
+    bookings = pd.read_csv(path, nrows=rows, dtype=BOOKING_DTYPES, encoding='ISO-8859-1')
+    bookings['flight_day'] = map_flight_day(bookings['flight_day'])
+    return bookings
+
+
+def canary_run(active, bookings, repeat=5):
+    """Score the canary batch; returns (probabilities, best seconds)"""
+    from src.feature_eng import engineer_feature_matrix, get_feature_columns
+
+    X = engineer_feature_matrix(bookings, route_stats=active.route_stats)
+    if active.feature_info is not None and list(active.feature_info['model_features']) != get_feature_columns():
+        raise RegistryError(f"{active.version} was trained on a different feature set")
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, probability, _ = score_features(active.model, active.scaler, X)
+        best = min(best, time.perf_counter() - start)
+    return probability, best
+
+
+def validate(candidate, live, bookings, max_slowdown=MAX_SLOWDOWN):
+    """Raise RegistryError unless the candidate gives valid probabilities no slower than allowed"""
+    probability, seconds = canary_run(candidate, bookings)
+    if probability.shape != (len(bookings),) or not np.isfinite(probability).all() \
+            or probability.min() < 0 or probability.max() > 1:
+        raise RegistryError(f"{candidate.version} produced invalid probabilities on the canary batch")
+    if live is not None:
+        _, live_seconds = canary_run(live, bookings)
+        # A millisecond of slack keeps timer noise on small batches from rejecting equal models
+        if seconds > max_slowdown * live_seconds + 1e-3:
+            raise RegistryError(f"{candidate.version} scored the canary batch in {seconds * 1e3:.1f} ms, "
+                                f"{live.version} in {live_seconds * 1e3:.1f} ms")
+    return seconds
+
+
+class ModelHandle:
+    """Live model reference swapped atomically when the registry's CURRENT pointer changes
+
+    Readers call get() once per request and use that ModelVersion throughout,
+    so a swap never mixes artifacts from two versions. A version that fails
+    validation is rejected by this replica only and logged to REJECTIONS.
+    """
+
+    def __init__(self, registry_dir=REGISTRY_DIR, fallback_dir=MODEL_DIR, compiled=False,
+                 max_slowdown=MAX_SLOWDOWN, warm=True):
+        self.registry_dir = registry_dir
+        self.compiled = compiled
+        self.max_slowdown = max_slowdown
+        self.warm = warm
+        self.events = collections.deque(maxlen=50)
+        self._canary = None
+        self._stop = threading.Event()
+        self._thread = None
+        version = current_version(registry_dir)
+        self._active = load_version(os.path.join(registry_dir, version) if version else fallback_dir, compiled)
+        self._seen = version
+        if warm:
+            warm_up(self._active.model, self._active.scaler, self._active.route_stats)
+
+    def get(self):
+        return self._active
+
+    @property
+    def version(self):
+        return self._active.version
+
+    def _event(self, outcome, version, detail=''):
+        self.events.append({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'version': version,
+                            'outcome': outcome, 'detail': detail})
+        metrics.count('model_reloads', outcome=outcome)
+
+    def check(self):
+        """Load, validate and swap in a new CURRENT version; returns True if the live model changed"""
+        version = current_version(self.registry_dir)
+        if version is None or version == self._seen or version == self._active.version:
+            self._seen = version
+            return False
+        self._seen = version
+        live = self._active
+        try:
+            candidate = load_version(os.path.join(self.registry_dir, version), self.compiled)
+            if self._canary is None:
+                self._canary = canary_bookings()
+            seconds = validate(candidate, live, self._canary, self.max_slowdown)
+            if self.warm:
+                warm_up(candidate.model, candidate.scaler, candidate.route_stats)
+        except Exception as exc:
+            # Only this replica keeps serving the live version; other replicas may have accepted the candidate,
+            # so CURRENT is left for the operator to activate or roll back
+            self._event('rejected', version, str(exc))
+            try:
+                record_rejection(version, str(exc), self.registry_dir)
+            except OSError:
+                pass
+            return False
+        self._active = candidate
+        reload_route_stats()
+        self._event('promoted', version, f"canary batch in {seconds * 1e3:.1f} ms")
+        return True
+
+    def watch(self, interval=WATCH_INTERVAL):
+        """Poll the registry from a daemon thread, off the request path"""
+        if self._thread is not None:
+            return self
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.check()
+                except Exception as exc:
+                    self._event('error', current_version(self.registry_dir), str(exc))
+
+        self._thread = threading.Thread(target=run, name='model-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Versioned local model registry")
+    sub = parser.add_subparsers(dest='command', required=True)
+    publish_cmd = sub.add_parser('publish', help="copy a model directory into a new version")
+    publish_cmd.add_argument('source', nargs='?', default=MODEL_DIR)
+    publish_cmd.add_argument('--activate', action='store_true', help="also point CURRENT at it")
+    activate_cmd = sub.add_parser('activate', help="point CURRENT at a version (running apps pick it up)")
+    activate_cmd.add_argument('version')
+    sub.add_parser('rollback', help="point CURRENT at the version published before it")
+    sub.add_parser('list')
+    verify_cmd = sub.add_parser('verify', help="validate a version on the canary batch against CURRENT")
+    verify_cmd.add_argument('version')
+    parser.add_argument('--registry', default=REGISTRY_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == 'publish':
+        os.makedirs(args.registry, exist_ok=True)
+        version = publish(args.source, args.registry, args.activate)
+        print(f"Published {args.source} as {version}" + (" (current)" if args.activate else ''))
+    elif args.command == 'activate':
+        set_current(args.version, args.registry)
+        print(f"CURRENT -> {args.version}")
+    elif args.command == 'rollback':
+        versions = list_versions(args.registry)
+        current = current_version(args.registry)
+        if current not in versions or versions.index(current) == 0:
+            raise RegistryError(f"No version before {current} to roll back to")
+        previous = versions[versions.index(current) - 1]
+        set_current(previous, args.registry)
+        print(f"CURRENT -> {previous}")
+    elif args.command == 'verify':
+        candidate = load_version(os.path.join(args.registry, args.version))
+        live_version = current_version(args.registry)
+        live = load_version(os.path.join(args.registry, live_version)) if live_version else None
+        seconds = validate(candidate, live, canary_bookings())
+        print(f"{args.version} OK: canary batch in {seconds * 1e3:.1f} ms")
+    else:
+        current = current_version(args.registry)
+        rejected = rejections(args.registry)
+        for version in list_versions(args.registry):
+            with open(os.path.join(args.registry, version, MANIFEST)) as f:
+                manifest = json.load(f)
+            marker = '*' if version == current else ' '
+            note = f"  (rejected {len(rejected[version])}x)" if rejected.get(version) else ''
+            print(f"{marker} {version}  {manifest['created']}  {manifest['source']}{note}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import argparse
+import functools
+import os
+import sys
+
+import numpy as np
+
+ROUTE_STATS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model', 'route_stats.npy')
+
+# Longest route the index stores; dataset routes are two 3-letter airport codes
+ROUTE_WIDTH = 8
+
+# One record per route, sorted by route so batches can be looked up with searchsorted
+ROUTE_STATS_DTYPE = np.dtype([
+    ('route', f'U{ROUTE_WIDTH}'),
+    ('count', '<i8'),
+    ('labelled', '<i8'),
+    ('completed', '<i8'),
+])
+
+# Popular routes are the top 25% by route frequency, as in training
+POPULAR_QUANTILE = 0.75
+
+
+def normalize_route(route):
+    """Normalize a route like 'lhr-jfk' to the dataset form 'LHRJFK'"""
+    return str(route).strip().upper().replace('-', '')
+
+
+def _factorize_routes(routes):
+    """Codes into the distinct routes of a batch, with normalize_route applied to each distinct route
+
+    Routes are kept at full length (not cut to ROUTE_WIDTH), so a longer route
+    never matches a stored one by its prefix.
+    """
+    import pandas as pd
+
+    codes, uniques = pd.factorize(np.asarray(routes, dtype=object))
+    return codes, np.array([normalize_route(route) for route in uniques], dtype=str).reshape(-1)
+
+
+def _row_quantile(counts, q):
+    """Quantile of route_frequency over bookings (each route counted once per booking)
+
+    Matches Series.quantile on the per-booking column without materializing it.
+    """
+    counts = np.sort(counts[counts > 0])
+    if len(counts) == 0:
+        return 0.0
+    position = q * (counts.sum() - 1)
+    cumulative = np.cumsum(counts)
+    lo, hi = counts[np.searchsorted(cumulative, [np.floor(position), np.ceil(position)], side='right')]
+    return lo + (hi - lo) * (position - np.floor(position))
+
+
+class RouteStats:
+    """Route -> (count, popular flag, completion rate) index over a sorted record array"""
+
+    def __init__(self, table):
+        self.table = table
+        self.routes = table['route']
+        self.counts = table['count']
+        self.popular_threshold = _row_quantile(np.asarray(self.counts), POPULAR_QUANTILE)
+        self._rows = {route: i for i, route in enumerate(self.routes.tolist())}
+
+    def __len__(self):
+        return len(self.table)
+
+    @classmethod
+    def build(cls, routes, completed=None):
+        """Build the index from per-booking routes and optional booking_complete labels"""
+        return cls(np.zeros(0, dtype=ROUTE_STATS_DTYPE)).update(routes, completed)
+
+    @classmethod
+    def from_csv(cls, path='data/preprocessed_data.csv', chunksize=500_000):
+        """Build the index from a booking file, reading it in chunks"""
+        import pandas as pd
+
+        stats = cls(np.zeros(0, dtype=ROUTE_STATS_DTYPE))
+        for chunk in pd.read_csv(path, chunksize=chunksize, encoding='ISO-8859-1'):
+            completed = chunk['booking_complete'] if 'booking_complete' in chunk else None
+            stats = stats.update(chunk['route'], completed)
+        return stats
+
+    @classmethod
+    def load(cls, path=ROUTE_STATS_PATH):
+        """Memory-map a saved index"""
+        return cls(np.load(path, mmap_mode='r'))
+
+    def save(self, path=ROUTE_STATS_PATH):
+        """Write the index atomically so running readers keep a consistent file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(self.table))
+        os.replace(tmp_path, path)
+
+    def update(self, routes, completed=None):
+        """Return a new index with a batch of bookings merged in, without rescanning old data"""
+        codes, uniques = _factorize_routes(routes)
+        too_long = [route for route in uniques.tolist() if len(route) > ROUTE_WIDTH]
+        if too_long:
+            raise ValueError(f"Routes longer than {ROUTE_WIDTH} characters: {', '.join(too_long[:5])}")
+        routes, inverse = np.unique(uniques.astype(ROUTE_STATS_DTYPE['route']), return_inverse=True)
+        inverse = inverse[codes]
+        counts = np.bincount(inverse, minlength=len(routes))
+        if completed is None:
+            labelled = np.zeros(len(routes), dtype=np.int64)
+            completed = labelled
+        else:
+            labelled = counts
+            completed = np.bincount(inverse, weights=np.asarray(completed), minlength=len(routes)).astype(np.int64)
+
+        table = np.array(self.table)
+        pos = np.searchsorted(table['route'], routes)
+        known = pos < len(table)
+        known[known] = table['route'][pos[known]] == routes[known]
+        table['count'][pos[known]] += counts[known]
+        table['labelled'][pos[known]] += labelled[known]
+        table['completed'][pos[known]] += completed[known]
+
+        new = np.zeros((~known).sum(), dtype=ROUTE_STATS_DTYPE)
+        new['route'] = routes[~known]
+        new['count'] = counts[~known]
+        new['labelled'] = labelled[~known]
+        new['completed'] = completed[~known]
+        if len(new):
+            table = np.concatenate([table, new])
+            table.sort(order='route', kind='stable')
+        return RouteStats(table)
+
+    def _stats(self, rows, found):
+        counts = np.where(found, self.counts[rows], 0)
+        labelled = np.where(found, self.table['labelled'][rows], 0)
+        completed = np.where(found, self.table['completed'][rows], 0)
+        rate = np.divide(completed, labelled, out=np.zeros(len(rows)), where=labelled > 0)
+        return counts, (found & (counts >= self.popular_threshold)).astype(np.int64), rate
+
+    def lookup(self, route):
+        """(count, is_popular, completion_rate) for one route; unknown routes get zeros"""
+        row = self._rows.get(normalize_route(route))
+        if row is None:
+            return 0, 0, 0.0
+        record = self.table[row]
+        count, labelled = int(record['count']), int(record['labelled'])
+        rate = record['completed'] / labelled if labelled else 0.0
+        return count, int(count >= self.popular_threshold), float(rate)
+
+    def lookup_many(self, routes):
+        """Vectorized lookup returning (counts, is_popular, completion_rates) arrays"""
+        if len(routes) == 1:
+            count, popular, rate = self.lookup(np.asarray(routes, dtype=object)[0])
+            return np.array([count]), np.array([popular]), np.array([rate])
+        codes, uniques = _factorize_routes(routes)
+        if len(self.table) == 0:
+            zeros = np.zeros(len(codes), dtype=np.int64)
+            return zeros, zeros, np.zeros(len(codes))
+        rows = np.minimum(np.searchsorted(self.routes, uniques), len(self.table) - 1)
+        counts, popular, rate = self._stats(rows, self.routes[rows] == uniques)
+        return counts[codes], popular[codes], rate[codes]
+
+
+@functools.lru_cache(maxsize=None)
+def default_route_stats():
+    """Route statistics shipped with the model, memory-mapped once per process
+
+    Later rewrites of route_stats.npy are not seen until reload_route_stats()
+    is called (model swaps in src.registry do this) or the process restarts.
+    """
+    return RouteStats.load()
+
+
+def reload_route_stats():
+    """Re-read route_stats.npy so later default_route_stats() calls see an updated index"""
+    default_route_stats.cache_clear()
+    return default_route_stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the route statistics index")
+    parser.add_argument('command', choices=['build', 'update'])
+    parser.add_argument('source', nargs='?', default='data/preprocessed_data.csv', help="booking CSV")
+    parser.add_argument('--index', default=ROUTE_STATS_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        stats = RouteStats.from_csv(args.source)
+    else:
+        import pandas as pd
+
+        stats = RouteStats.load(args.index)
+        for chunk in pd.read_csv(args.source, chunksize=500_000, encoding='ISO-8859-1'):
+            completed = chunk['booking_complete'] if 'booking_complete' in chunk else None
+            stats = stats.update(chunk['route'], completed)
+    stats.save(args.index)
+    print(f"{len(stats)} routes, popular threshold {stats.popular_threshold:g} bookings -> {args.index}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+
+from src import metrics
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model')
+
+THRESHOLDS_PATH = os.path.join(MODEL_DIR, 'thresholds.json')
+
+RISK_TIERS = ['HIGH', 'MEDIUM', 'LOW']
+DEFAULT_CLASS_THRESHOLD = 0.5
+DEFAULT_LOW_RISK_THRESHOLD = 0.7
+
+
+def load_thresholds(path=THRESHOLDS_PATH):
+    """Class and low-risk cut-offs written by src.calibrate, or the defaults without a config"""
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return DEFAULT_CLASS_THRESHOLD, DEFAULT_LOW_RISK_THRESHOLD
+    return float(config['class_threshold']), float(config['low_risk_threshold'])
+
+
+# Read once at startup; everything that scores uses these
+CLASS_THRESHOLD, LOW_RISK_THRESHOLD = load_thresholds()
+
+
+def load_model_and_scaler(model_dir=MODEL_DIR, compiled=False):
+    """Load the pickled model and scaler, or the compiled NumPy ensemble, from the model directory
+
+    A compiled ensemble exported from an older best_model.pkl is ignored in favour of the pickles.
+    """
+    if compiled:
+        from src.tree_model import StaleCompiledModel, load_compiled
+
+        try:
+            return load_compiled(os.path.join(model_dir, 'best_model.npz'),
+                                 source=os.path.join(model_dir, 'best_model.pkl'))
+        except StaleCompiledModel as exc:
+            print(f"{exc}; loading the pickled model instead", file=sys.stderr)
+    with open(os.path.join(model_dir, 'best_model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    with open(os.path.join(model_dir, 'scaler.pkl'), 'rb') as f:
+        scaler = pickle.load(f)
+    return model, scaler
+
+
+def uses_scaled_features(model):
+    """Only linear models were trained on scaled features"""
+    return hasattr(model, 'coef_')
+
+
+def score_features(model, scaler, X):
+    """Run one predict_proba pass and derive class, probability and confidence"""
+    if uses_scaled_features(model):
+        with metrics.timer('scaling'):
+            X = scaler.transform(X)
+    with metrics.timer('inference'):
+        probability = model.predict_proba(X)[:, 1]
+    prediction, confidence = classify(probability)
+    return prediction, probability, confidence
+
+
+def classify(probability):
+    """Class and confidence in that class for completion probabilities"""
+    prediction = (probability > CLASS_THRESHOLD).astype(np.int8)
+    confidence = np.where(prediction == 1, probability, 1 - probability)
+    return prediction, confidence
+
+
+def risk_tier_codes(prediction, confidence):
+    """Map predictions to indices into RISK_TIERS (0=HIGH, 1=MEDIUM, 2=LOW)"""
+    return np.where(prediction == 0, 0, np.where(confidence < LOW_RISK_THRESHOLD, 1, 2)).astype(np.int8)
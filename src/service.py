@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+from src import metrics
+from src.booking import BookingRecord, records_to_array
+from src.drift import DriftMonitor
+from src.feature_eng import engineer_feature_matrix
+from src.registry import warm_up
+from src.scoring import MODEL_DIR, RISK_TIERS, load_model_and_scaler, risk_tier_codes, score_features
+from src.shadow import ShadowScorer, load_candidates
+from src.suggest import decode_suggestions, suggestion_masks
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class BadRequest(ValueError):
+    """Client error, reported as HTTP 400"""
+
+
+def prepare_booking(payload):
+    """Validate a booking payload into a BookingRecord"""
+    if not isinstance(payload, dict):
+        raise BadRequest("Booking must be a JSON object")
+    try:
+        return BookingRecord.from_mapping(payload)
+    except ValueError as exc:
+        raise BadRequest(str(exc))
+
+
+def score_batch(model, scaler, bookings, shadow=None, drift=None):
+    """Score prepared bookings together, answering each with prediction, confidence and suggestions"""
+    columns = records_to_array(bookings)
+    X = engineer_feature_matrix(columns)
+    start = time.perf_counter()
+    prediction, probability, confidence = score_features(model, scaler, X)
+    if shadow is not None:
+        shadow.submit(columns, probability, time.perf_counter() - start)
+    if drift is not None:
+        drift.update(X)
+    tiers = risk_tier_codes(prediction, confidence)
+    metrics.count_risk_tiers(tiers, RISK_TIERS)
+    masks = suggestion_masks(prediction, confidence, columns)
+    return [
+        {
+            'prediction': int(prediction[i]),
+            'probability': float(probability[i]),
+            'confidence': float(confidence[i]),
+            'risk_level': RISK_TIERS[tiers[i]],
+            'suggestions': decode_suggestions(masks[i]),
+        }
+        for i in range(len(bookings))
+    ]
+
+
+class MicroBatcher:
+    """Merge concurrent requests into batches bounded by size and a time window"""
+
+    def __init__(self, score_fn, max_batch=64, max_wait_ms=2.0):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._task = None
+        # One scoring thread keeps the event loop free while a batch runs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scorer')
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Anything already queued joins without waiting
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.score_fn, items)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class ScoringService:
+    """Minimal HTTP/1.1 JSON service: POST /predict, GET /health, GET /metrics[.json], GET /shadow, GET /drift"""
+
+    def __init__(self, model, scaler, max_batch=64, max_wait_ms=2.0, shadow=None, drift=None):
+        self.batcher = MicroBatcher(lambda bookings: score_batch(model, scaler, bookings, shadow, drift),
+                                    max_batch, max_wait_ms)
+        self.shadow = shadow
+        self.drift = drift
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=8000):
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def _route(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok', 'batches': self.batcher.batches, 'requests': self.batcher.items}
+        if path == '/metrics':
+            return 200, metrics.REGISTRY.to_prometheus()
+        if path == '/metrics.json':
+            return 200, json.loads(metrics.REGISTRY.to_json())
+        if path == '/shadow':
+            if self.shadow is None:
+                return 404, {'error': "Shadow scoring is not enabled"}
+            return 200, self.shadow.summary()
+        if path == '/drift':
+            if self.drift is None:
+                return 404, {'error': "Drift monitoring is not enabled"}
+            return 200, self.drift.report()
+        if path != '/predict':
+            return 404, {'error': f"Unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST"}
+        try:
+            booking = prepare_booking(json.loads(body))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return 400, {'error': "Body must be valid UTF-8 JSON"}
+        except BadRequest as exc:
+            return 400, {'error': str(exc)}
+        return 200, await self.batcher.submit(booking)
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            data, content_type = json.dumps(payload).encode(), 'application/json'
+        writer.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    # Nothing after a malformed request line can be trusted, so answer and close
+                    await self._respond(writer, 400, {'error': "Malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    status, payload = 400, {'error': "Invalid Content-Length"}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': "Request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, payload = await self._route(method, path, body)
+                    except Exception as exc:
+                        status, payload = 500, {'error': str(exc)}
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+SAMPLE_BOOKING = {
+    'num_passengers': 2, 'sales_channel': 'Internet', 'trip_type': 'RoundTrip', 'purchase_lead': 30,
+    'length_of_stay': 7, 'flight_hour': 12, 'flight_day': 'Mon', 'route': 'AKLDEL', 'booking_origin': 'UK',
+    'wants_extra_baggage': 1, 'wants_preferred_seat': 0, 'wants_in_flight_meals': 0, 'flight_duration': 5.5,
+}
+
+
+async def run_load(host, port, requests=2000, concurrency=32):
+    """Send bookings over keep-alive connections and return per-request latencies in seconds"""
+    body = json.dumps(SAMPLE_BOOKING).encode()
+    request = (f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+    latencies = []
+    remaining = [requests]
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            length = 0
+            status = await reader.readline()
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if not status.startswith(b'HTTP/1.1 200'):
+                raise RuntimeError(f"Unexpected response {status!r}")
+        writer.close()
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return np.array(latencies)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Booking scoring HTTP service")
+    parser.add_argument('command', choices=['serve', 'loadgen'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000, help="port to serve on (loadgen: 0 starts a local server)")
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--compiled', action=argparse.BooleanOptionalAction, default=True,
+                        help="use model/best_model.npz when present (default); --no-compiled loads the pickles")
+    parser.add_argument('--shadow', action='append', default=[], metavar='MODEL_DIR',
+                        help="also score every batch with this candidate in the background (repeatable)")
+    parser.add_argument('--drift', action='store_true',
+                        help="track feature drift against model/drift_reference.npz (GET /drift)")
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args(argv)
+
+    shadow = ShadowScorer(load_candidates(args.shadow, args.compiled)) if args.shadow else None
+    drift = DriftMonitor() if args.drift else None
+
+    def load():
+        compiled = args.compiled and os.path.exists(os.path.join(MODEL_DIR, 'best_model.npz'))
+        start = time.perf_counter()
+        model, scaler = load_model_and_scaler(compiled=compiled)
+        warm_up(model, scaler)
+        print(f"Loaded and warmed up the {'compiled' if compiled else 'pickled'} model in "
+              f"{(time.perf_counter() - start) * 1e3:.0f} ms", file=sys.stderr)
+        return model, scaler
+
+    async def serve():
+        model, scaler = load()
+        service = ScoringService(model, scaler, args.max_batch, args.max_wait_ms, shadow, drift)
+        port = await service.start(args.host, args.port)
+        print(f"Serving on http://{args.host}:{port}", file=sys.stderr)
+        await asyncio.Event().wait()
+
+    async def loadgen():
+        service = None
+        port = args.port
+        if port == 0:
+            model, scaler = load()
+            service = ScoringService(model, scaler, args.max_batch, args.max_wait_ms, shadow, drift)
+            port = await service.start(args.host, 0)
+        await run_load(args.host, port, min(args.requests, 100), args.concurrency)  # warm-up
+        start = time.perf_counter()
+        latencies = await run_load(args.host, port, args.requests, args.concurrency) * 1e3
+        elapsed = time.perf_counter() - start
+        print(f"{len(latencies):,} requests, concurrency {args.concurrency}: "
+              f"{len(latencies) / elapsed:,.0f} req/s, p50 {np.percentile(latencies, 50):.2f} ms, "
+              f"p99 {np.percentile(latencies, 99):.2f} ms")
+        if service is not None:
+            print(f"mean batch size {service.batcher.items / max(service.batcher.batches, 1):.1f}")
+        if shadow is not None:
+            shadow.join()
+            print(json.dumps(shadow.summary(), indent=2))
+        if drift is not None:
+            print(json.dumps(drift.report()['features'][:5], indent=2))
+        if service is not None:
+            await service.stop()
+
+    try:
+        asyncio.run(serve() if args.command == 'serve' else loadgen())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from src import metrics
+from src.metrics import Histogram
+from src.feature_eng import engineer_feature_matrix
+from src.scoring import CLASS_THRESHOLD, score_features
+
+DEFAULT_QUEUE_SIZE = 256
+
+# |candidate - live| probability buckets
+DELTA_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class ShadowSummary:
+    """Constant-size running comparison of one candidate against the live model"""
+
+    def __init__(self):
+        self.batches = 0
+        self.rows = 0
+        self.agreements = 0
+        self.delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.abs_delta = Histogram(DELTA_BUCKETS)
+        self.live_latency = Histogram()
+        self.latency = Histogram()
+        self.errors = 0
+
+    def update(self, live_probability, probability, live_seconds, seconds):
+        delta = probability - live_probability
+        abs_delta = np.abs(delta)
+        self.batches += 1
+        self.rows += len(delta)
+        self.agreements += int(((probability > CLASS_THRESHOLD) == (live_probability > CLASS_THRESHOLD)).sum())
+        self.delta_sum += float(delta.sum())
+        self.max_abs_delta = max(self.max_abs_delta, float(abs_delta.max(initial=0.0)))
+        self.abs_delta.observe_many(abs_delta)
+        if live_seconds is not None:
+            self.live_latency.observe(live_seconds)
+        self.latency.observe(seconds)
+
+    def to_dict(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'agreement': self.agreements / self.rows if self.rows else None,
+            'mean_delta': self.delta_sum / self.rows if self.rows else None,
+            'mean_abs_delta': self.abs_delta.sum / self.rows if self.rows else None,
+            'p95_abs_delta': min(self.abs_delta.quantile(0.95), self.max_abs_delta),
+            'max_abs_delta': self.max_abs_delta,
+            'live_p50_ms': 1e3 * self.live_latency.quantile(0.5),
+            'live_p95_ms': 1e3 * self.live_latency.quantile(0.95),
+            'p50_ms': 1e3 * self.latency.quantile(0.5),
+            'p95_ms': 1e3 * self.latency.quantile(0.95),
+            'errors': self.errors,
+        }
+
+
+class ShadowScorer:
+    """Score live batches with candidate models on background threads
+
+    submit() never blocks: when the bounded queue is full the batch is dropped
+    and counted, so shadow scoring cannot slow down the live path. Candidates
+    get the raw booking columns and build features with their own route
+    statistics, then apply their own scaler and model.
+    """
+
+    def __init__(self, candidates, max_queue=DEFAULT_QUEUE_SIZE, workers=1):
+        # name -> object with .model, .scaler and .route_stats (e.g. a registry ModelVersion)
+        self.candidates = dict(candidates)
+        self.summaries = {name: ShadowSummary() for name in self.candidates}
+        self.submitted = 0
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, name=f'shadow-{i}', daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, columns, live_probability, live_seconds=None):
+        """Queue a scored batch for the candidates; returns False if it was dropped
+
+        columns holds the raw bookings in any form engineer_feature_matrix accepts.
+        It is read later from a worker thread, so callers must not reuse its memory.
+        """
+        try:
+            self._queue.put_nowait((columns, live_probability, live_seconds))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            metrics.count('shadow_batches', outcome='dropped')
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            columns, live_probability, live_seconds = item
+            for name, candidate in self.candidates.items():
+                summary = self.summaries[name]
+                try:
+                    X = engineer_feature_matrix(columns, route_stats=getattr(candidate, 'route_stats', None))
+                    start = time.perf_counter()
+                    _, probability, _ = score_features(candidate.model, candidate.scaler, X)
+                    seconds = time.perf_counter() - start
+                except Exception:
+                    with self._lock:
+                        summary.errors += 1
+                    continue
+                with self._lock:
+                    summary.update(live_probability, probability, live_seconds, seconds)
+            metrics.count('shadow_batches', outcome='scored')
+            self._queue.task_done()
+
+    def join(self):
+        """Wait until every queued batch has been scored"""
+        self._queue.join()
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def summary(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'queued': self._queue.qsize(),
+                'candidates': {name: summary.to_dict() for name, summary in self.summaries.items()},
+            }
+
+
+def load_candidates(paths, compiled=False):
+    """Candidate versions from registry version or model directories, named by version"""
+    from src.registry import load_version
+
+    candidates = {}
+    for path in paths:
+        candidate = load_version(path, compiled)
+        if hasattr(candidate.model, 'n_jobs'):
+            # One thread per shadow prediction keeps cores free for the live model
+            candidate.model.set_params(n_jobs=1)
+        candidates[candidate.version] = candidate
+    return candidates
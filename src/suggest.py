@@ -1,116 +1,203 @@
-import plotly.graph_objects as go
+import functools
+import operator
 
+import numpy as np
 
+from src.booking import SALES_CHANNELS, TRIP_TYPES
+from src.metrics import timed
+from src.scoring import LOW_RISK_THRESHOLD
 
+# Suggestion catalog; a booking's mask has bit i set when SUGGESTIONS[i] applies.
+# Bit order is display order, so decoding a mask lists suggestions as the UI shows them.
+SUGGESTIONS = (
+    {'title': '🚨 HIGH RISK - Booking Likely to be Abandoned', 'priority': 'CRITICAL', 'class': 'high-risk'},
+    {'title': '📞 Immediate Follow-up Required',
+     'description': 'Contact customer within 2 hours to address concerns and provide assistance',
+     'class': 'high-risk'},
+    {'title': '🎁 Apply Incentive Offer',
+     'description': 'Offer 10-15% discount or complimentary service upgrade to encourage completion',
+     'class': 'high-risk'},
+    {'title': '⚠️ MEDIUM RISK - Monitor Closely', 'priority': 'MODERATE', 'class': 'medium-risk'},
+    {'title': '📧 Send Confirmation Reminder',
+     'description': 'Send an email within 24 hours with booking benefits and support contact',
+     'class': 'medium-risk'},
+    {'title': '✅ LOW RISK - Standard Monitoring', 'priority': 'LOW', 'class': 'low-risk'},
+    {'title': '📬 Standard Follow-up',
+     'description': 'Send automated confirmation email and proceed with normal workflow',
+     'class': 'low-risk'},
+    {'title': '📅 Last-Minute Booking',
+     'description': 'Expedite support response. Ensure 24/7 helpline availability. Highlight flexible cancellation.',
+     'class': 'high-risk'},
+    {'title': '📅 Last-Minute Booking',
+     'description': 'Expedite support response. Ensure 24/7 helpline availability. Highlight flexible cancellation.',
+     'class': 'medium-risk'},
+    {'title': '💰 Price-Sensitive Customer',
+     'description': 'Emphasize value for money. Offer bundle deals (e.g., baggage + meals at 20% off).',
+     'class': 'medium-risk'},
+    {'title': '👨‍👩‍👧‍👦 Group Booking',
+     'description': 'Verify group discount is applied. Assign dedicated agent. Simplify group check-in process.',
+     'class': 'medium-risk'},
+    {'title': '✈️ Long-Haul Flight',
+     'description': 'Highlight premium amenities, entertainment options, and comfort features.',
+     'class': 'low-risk'},
+    {'title': '📱 Mobile Booking',
+     'description': 'Ensure mobile-optimized checkout. Send push notifications. Enable quick payment options.',
+     'class': 'medium-risk'},
+    {'title': '📱 Mobile Booking',
+     'description': 'Ensure mobile-optimized checkout. Send push notifications. Enable quick payment options.',
+     'class': 'low-risk'},
+    {'title': '🏨 Extended Stay',
+     'description': 'Recommend hotel packages, car rental deals, or travel insurance for long trips.',
+     'class': 'low-risk'},
+    {'title': '🌙 Inconvenient Flight Time',
+     'description': 'Offer lounge access or airport hotel options. Explain convenience of early/late flights.',
+     'class': 'medium-risk'},
+)
+
+(HIGH_RISK, IMMEDIATE_FOLLOW_UP, INCENTIVE_OFFER, MEDIUM_RISK, CONFIRMATION_REMINDER, LOW_RISK,
+ STANDARD_FOLLOW_UP, LAST_MINUTE_HIGH, LAST_MINUTE_MEDIUM, PRICE_SENSITIVE, GROUP_BOOKING, LONG_HAUL,
+ MOBILE_MEDIUM, MOBILE_LOW, EXTENDED_STAY, INCONVENIENT_TIME) = range(len(SUGGESTIONS))
+
+MASK_DTYPE = np.uint16
+
+# Placeholder resolved to the caller's low-risk threshold when rules are evaluated
+THRESHOLD = 'low_risk_threshold'
+
+_OPS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'not <': lambda a, b: np.logical_not(a < b),
+}
+# Single-booking evaluation stays in plain Python
+_SCALAR_OPS = dict(_OPS, **{'not <': lambda a, b: not a < b})
+
+# Declarative rule table: suggestion ids emitted when every (field, op, value) clause holds
+RULES = (
+    ((HIGH_RISK, IMMEDIATE_FOLLOW_UP, INCENTIVE_OFFER), (('prediction', '==', 0),)),
+    ((MEDIUM_RISK, CONFIRMATION_REMINDER), (('prediction', '!=', 0), ('confidence', '<', THRESHOLD))),
+    ((LOW_RISK, STANDARD_FOLLOW_UP), (('prediction', '!=', 0), ('confidence', 'not <', THRESHOLD))),
+    ((LAST_MINUTE_HIGH,), (('purchase_lead', '<', 7), ('prediction', '==', 0))),
+    ((LAST_MINUTE_MEDIUM,), (('purchase_lead', '<', 7), ('prediction', '!=', 0))),
+    ((PRICE_SENSITIVE,), (('total_extras', '==', 0),)),
+    ((GROUP_BOOKING,), (('num_passengers', '>=', 3),)),
+    ((LONG_HAUL,), (('flight_duration', '>', 6),)),
+    ((MOBILE_MEDIUM,), (('sales_channel', '==', 'Mobile'), ('prediction', '==', 0))),
+    ((MOBILE_LOW,), (('sales_channel', '==', 'Mobile'), ('prediction', '!=', 0))),
+    ((EXTENDED_STAY,), (('length_of_stay', '>', 14),)),
+    ((INCONVENIENT_TIME,), (('inconvenient_flight_time', '!=', 0),)),
+)
+
+
+def _compile_rules(rules):
+    """Deduplicate clauses, pairing each with the bits cleared when it does not hold"""
+    all_bits = 0
+    clears = {}
+    for ids, conditions in rules:
+        bits = sum(1 << i for i in ids)
+        all_bits |= bits
+        for clause in conditions:
+            clears[clause] = clears.get(clause, 0) | bits
+    # Every suggestion id belongs to exactly one rule, so a rule's bits survive only if all its clauses hold
+    return all_bits, tuple((field, op, value, all_bits & ~bits) for (field, op, value), bits in clears.items())
+
+
+_ALL_BITS, _CLAUSES = _compile_rules(RULES)
+_SCALAR_CLAUSES = tuple((field, _SCALAR_OPS[op], value, value == THRESHOLD, clears)
+                        for field, op, value, clears in _CLAUSES)
+
+
+def _booking_column(bookings, name):
+    """Column from a DataFrame, dict of arrays or structured array, deriving the app's helper fields if absent"""
+    try:
+        return np.asarray(bookings[name])
+    except (KeyError, ValueError):
+        if name == 'total_extras':
+            return (np.asarray(bookings['wants_extra_baggage']) + np.asarray(bookings['wants_preferred_seat'])
+                    + np.asarray(bookings['wants_in_flight_meals']))
+        if name == 'inconvenient_flight_time':
+            hour = np.asarray(bookings['flight_hour'])
+            return ((hour < 6) | (hour >= 22)).astype(np.int8)
+        raise
+
+
+# Categorical fields that BOOKING_DTYPE arrays carry as codes
+_CATEGORY_CODES = {'sales_channel': SALES_CHANNELS, 'trip_type': TRIP_TYPES}
+
+
+@timed('suggestions', rows=lambda prediction, *args, **kwargs: np.size(prediction))
+def suggestion_masks(prediction, confidence, bookings, low_risk_threshold=LOW_RISK_THRESHOLD):
+    """Bitmask of applicable suggestions for every booking in a batch, one vectorized pass per clause"""
+    columns = {'prediction': np.asarray(prediction), 'confidence': np.asarray(confidence)}
+    masks = np.full(len(columns['prediction']), _ALL_BITS, dtype=MASK_DTYPE)
+    for field, op, value, clears in _CLAUSES:
+        if field not in columns:
+            columns[field] = _booking_column(bookings, field)
+        if value == THRESHOLD:
+            value = low_risk_threshold
+        elif isinstance(value, str) and columns[field].dtype.kind in 'iu':
+            value = _CATEGORY_CODES[field].index(value)
+        held = _OPS[op](columns[field], value)
+        masks &= np.where(held, MASK_DTYPE(_ALL_BITS), MASK_DTYPE(clears))
+    return masks
+
+
+def suggestion_mask(prediction, confidence, input_data, low_risk_threshold=LOW_RISK_THRESHOLD):
+    """Bitmask of applicable suggestions for a single booking"""
+    # Plain Python numbers compare several times faster than NumPy scalars
+    if isinstance(prediction, np.generic):
+        prediction = prediction.item()
+    if isinstance(confidence, np.generic):
+        confidence = confidence.item()
+    values = {'prediction': prediction, 'confidence': confidence}
+    mask = _ALL_BITS
+    for field, op, value, is_threshold, clears in _SCALAR_CLAUSES:
+        if not op(values[field] if field in values else input_data[field],
+                  low_risk_threshold if is_threshold else value):
+            mask &= clears
+    return mask
+
+
+@functools.lru_cache(maxsize=4096)
+def suggestion_ids(mask):
+    """Suggestion ids set in a mask, in display order"""
+    mask = int(mask)
+    return tuple(i for i in range(len(SUGGESTIONS)) if mask >> i & 1)
+
+
+@functools.lru_cache(maxsize=4096)
+def _suggestion_entries(mask):
+    return tuple(SUGGESTIONS[i] for i in suggestion_ids(mask))
+
+
+def decode_suggestions(mask):
+    """Expand a mask into fresh suggestion dicts as rendered by the app"""
+    return [entry.copy() for entry in _suggestion_entries(int(mask))]
+
+
+@timed('suggestions')
 def get_suggestions(prediction, probability, input_data):
     """Generate suggestions based on prediction and input data"""
-    suggestions = []
-    
-    if prediction == 0:  # Will NOT complete
-        suggestions.append({
-            'title': '🚨 HIGH RISK - Booking Likely to be Abandoned',
-            'priority': 'CRITICAL',
-            'class': 'high-risk'
-        })
-        suggestions.append({
-            'title': '📞 Immediate Follow-up Required',
-            'description': 'Contact customer within 2 hours to address concerns and provide assistance',
-            'class': 'high-risk'
-        })
-        suggestions.append({
-            'title': '🎁 Apply Incentive Offer',
-            'description': 'Offer 10-15% discount or complimentary service upgrade to encourage completion',
-            'class': 'high-risk'
-        })
-    else:  # Will complete
-        if probability < 0.7:  # Low confidence
-            suggestions.append({
-                'title': '⚠️ MEDIUM RISK - Monitor Closely',
-                'priority': 'MODERATE',
-                'class': 'medium-risk'
-            })
-            suggestions.append({
-                'title': '📧 Send Confirmation Reminder',
-                'description': 'Send an email within 24 hours with booking benefits and support contact',
-                'class': 'medium-risk'
-            })
-        else:
-            suggestions.append({
-                'title': '✅ LOW RISK - Standard Monitoring',
-                'priority': 'LOW',
-                'class': 'low-risk'
-            })
-            suggestions.append({
-                'title': '📬 Standard Follow-up',
-                'description': 'Send automated confirmation email and proceed with normal workflow',
-                'class': 'low-risk'
-            })
-    
-    # Specific suggestions based on input
-    if input_data['purchase_lead'] < 7:
-        suggestions.append({
-            'title': '📅 Last-Minute Booking',
-            'description': 'Expedite support response. Ensure 24/7 helpline availability. Highlight flexible cancellation.',
-            'class': 'high-risk' if prediction == 0 else 'medium-risk'
-        })
-    
-    if input_data['total_extras'] == 0:
-        suggestions.append({
-            'title': '💰 Price-Sensitive Customer',
-            'description': 'Emphasize value for money. Offer bundle deals (e.g., baggage + meals at 20% off).',
-            'class': 'medium-risk'
-        })
-    
-    if input_data['num_passengers'] >= 3:
-        suggestions.append({
-            'title': '👨‍👩‍👧‍👦 Group Booking',
-            'description': 'Verify group discount is applied. Assign dedicated agent. Simplify group check-in process.',
-            'class': 'medium-risk'
-        })
-    
-    if input_data['flight_duration'] > 6:
-        suggestions.append({
-            'title': '✈️ Long-Haul Flight',
-            'description': 'Highlight premium amenities, entertainment options, and comfort features.',
-            'class': 'low-risk'
-        })
-    
-    if input_data['sales_channel'] == 'Mobile':
-        suggestions.append({
-            'title': '📱 Mobile Booking',
-            'description': 'Ensure mobile-optimized checkout. Send push notifications. Enable quick payment options.',
-            'class': 'medium-risk' if prediction == 0 else 'low-risk'
-        })
-    
-    if input_data['length_of_stay'] > 14:
-        suggestions.append({
-            'title': '🏨 Extended Stay',
-            'description': 'Recommend hotel packages, car rental deals, or travel insurance for long trips.',
-            'class': 'low-risk'
-        })
-    
-    if input_data['inconvenient_flight_time']:
-        suggestions.append({
-            'title': '🌙 Inconvenient Flight Time',
-            'description': 'Offer lounge access or airport hotel options. Explain convenience of early/late flights.',
-            'class': 'medium-risk'
-        })
-    
-    return suggestions
+    return decode_suggestions(suggestion_mask(prediction, probability, input_data))
+
 
+@timed('plotly_figure')
 def create_prediction_visual(prediction, probability):
     """Create a visual representation of the prediction"""
-    
+    import plotly.graph_objects as go
+
     if prediction == 1:
         color = '#10b981'
         result_text = "WILL COMPLETE"
         icon = "✅"
-        confidence = "High Confidence" if probability > 0.7 else "Moderate Confidence"
+        confidence = "High Confidence" if probability > LOW_RISK_THRESHOLD else "Moderate Confidence"
     else:
         color = '#ef4444'
         result_text = "WILL NOT COMPLETE"
         icon = "❌"
-        confidence = "High Confidence" if probability < 0.3 else "Moderate Confidence"
+        confidence = "High Confidence" if probability < 1 - LOW_RISK_THRESHOLD else "Moderate Confidence"
     
     fig = go.Figure()
     
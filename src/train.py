@@ -0,0 +1,277 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import pickle
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.dataset_store import file_sha256
+from src.feature_eng import engineer_feature_matrix, get_feature_columns
+from src.route_stats import RouteStats
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(ROOT, 'data', '.train_cache')
+DEFAULT_OUTPUT = os.path.join(ROOT, 'model', 'candidate')
+
+RANDOM_STATE = 42
+TEST_SIZE = 0.2
+
+# Search space of BA_Model_building_and_Evaluation.ipynb
+PARAM_DIST = {
+    'n_estimators': [100, 200, 300, 500, 800],
+    'learning_rate': [0.01, 0.03, 0.05, 0.1],
+    'max_leaves': [15, 31, 50, 100, 200],
+    'max_depth': [-1, 1, 2, 4, 6, 8, 10],
+    'min_child_samples': [10, 20, 30, 40, 50, 100],
+    'subsample': [0.6, 0.7, 0.8, 0.9, 1.0],
+    'colsample_bytree': [0.6, 0.7, 0.8, 0.9, 1.0],
+    'reg_alpha': [0.0, 0.1, 0.5, 1.0],
+    'reg_lambda': [0.0, 0.1, 0.5, 1.0],
+}
+
+# Code whose changes invalidate cached feature matrices
+_FEATURE_SOURCES = ['src/feature_eng.py', 'src/route_stats.py']
+
+
+@contextlib.contextmanager
+def stage(timings, name):
+    """Record and print the wall-clock time of one pipeline stage"""
+    start = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - start, 3)
+    print(f"[{name}] {timings[name]:.2f}s", file=sys.stderr)
+
+
+def load_bookings(data=None, store=None):
+    """Labelled bookings from a CSV or a dataset store, plus a key identifying their content"""
+    if store is not None:
+        from src.dataset_store import DatasetStore
+
+        bookings = DatasetStore(store)
+        key = ''.join(source['sha256'] for source in bookings.sources)
+        return bookings, hashlib.sha256(key.encode()).hexdigest()
+
+    import pandas as pd
+
+    from src.batch_score import BOOKING_DTYPES, map_flight_day
+
+    bookings = pd.read_csv(data, dtype=BOOKING_DTYPES, encoding='ISO-8859-1')
+    bookings['flight_day'] = map_flight_day(bookings['flight_day'])
+    return bookings, file_sha256(data)
+
+
+def feature_key(data_key):
+    digest = hashlib.sha256(data_key.encode())
+    for path in _FEATURE_SOURCES:
+        digest.update(file_sha256(os.path.join(ROOT, path)).encode())
+    return digest.hexdigest()[:16]
+
+
+def build_features(bookings, cache_dir, key, use_cache=True):
+    """Feature matrix, labels and route statistics; reused from cache_dir when the data and code are unchanged
+
+    Route statistics are computed over the whole dataset, as in the feature engineering notebook.
+    Returns (X, y, route_stats, cache_hit); X is memory-mapped when read from the cache.
+    """
+    paths = {name: os.path.join(cache_dir, f'{name}-{key}.npy') for name in ('X', 'y', 'routes')}
+    if use_cache and all(os.path.exists(path) for path in paths.values()):
+        return (np.load(paths['X'], mmap_mode='r'), np.load(paths['y']),
+                RouteStats(np.load(paths['routes'])), True)
+
+    y = np.asarray(bookings['booking_complete'], dtype=np.int8)
+    route_stats = RouteStats.build(bookings['route'], y)
+    X = engineer_feature_matrix(bookings, route_stats=route_stats)
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, array in (('X', X), ('y', y), ('routes', np.asarray(route_stats.table))):
+        tmp_path = f"{paths[name]}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, paths[name])
+    return X, y, route_stats, False
+
+
+def build_splits(y, cache_dir, key, n_folds, use_cache=True):
+    """Stratified train/test split and CV folds over the training rows, cached as index arrays"""
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    path = os.path.join(cache_dir, f'splits-{key}-{n_folds}.npz')
+    if use_cache and os.path.exists(path):
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}, True
+
+    rows = np.arange(len(y))
+    train, test = train_test_split(rows, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y)
+    splits = {'train': train, 'test': test}
+    cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=RANDOM_STATE)
+    for i, (fit, valid) in enumerate(cv.split(train, y[train])):
+        splits[f'fit_{i}'] = train[fit]
+        splits[f'valid_{i}'] = train[valid]
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **splits)
+    os.replace(tmp_path, path)
+    return splits, False
+
+
+def base_params(y_train):
+    """Fixed LGBMClassifier settings of the notebook's search"""
+    return {
+        'objective': 'binary',
+        'scale_pos_weight': float((y_train == 0).sum() / (y_train == 1).sum()),
+        'random_state': RANDOM_STATE,
+        'verbose': -1,
+    }
+
+
+# Search workers: the cached feature matrix is memory-mapped once per process, not pickled per task
+_worker = {}
+
+
+def _init_worker(features_path, labels_path, splits, n_folds, params, early_stopping):
+    # eval_set still works on every supported lightgbm; newer releases only warn about it
+    warnings.filterwarnings('ignore', message="The argument 'eval_set' is deprecated")
+    _worker.update(X=np.load(features_path, mmap_mode='r'), y=np.load(labels_path), splits=splits,
+                   n_folds=n_folds, params=params, early_stopping=early_stopping)
+
+
+def _evaluate_candidate(candidate):
+    """Mean validation AUC and best iteration of one parameter set over the CV folds"""
+    import lightgbm as lgb
+    from sklearn.metrics import roc_auc_score
+
+    X, y, splits = _worker['X'], _worker['y'], _worker['splits']
+    scores = []
+    iterations = []
+    for i in range(_worker['n_folds']):
+        fit, valid = splits[f'fit_{i}'], splits[f'valid_{i}']
+        model = lgb.LGBMClassifier(**_worker['params'], **candidate, metric='auc', n_jobs=1)
+        model.fit(X[fit], y[fit], eval_set=[(X[valid], y[valid])],
+                  callbacks=[lgb.early_stopping(_worker['early_stopping'], verbose=False)])
+        scores.append(roc_auc_score(y[valid], model.predict_proba(X[valid])[:, 1]))
+        iterations.append(model.best_iteration_ or candidate['n_estimators'])
+    return {'params': candidate, 'cv_auc': float(np.mean(scores)), 'cv_auc_std': float(np.std(scores)),
+            'best_iteration': int(round(np.mean(iterations)))}
+
+
+def search(features_path, labels_path, splits, n_folds, params, n_iter, workers, early_stopping):
+    """Randomized search over PARAM_DIST, one candidate per task across a process pool"""
+    from sklearn.model_selection import ParameterSampler
+
+    candidates = list(ParameterSampler(PARAM_DIST, n_iter, random_state=RANDOM_STATE))
+    initargs = (features_path, labels_path, splits, n_folds, params, early_stopping)
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn'), initializer=_init_worker,
+                             initargs=initargs) as pool:
+        results = []
+        for result in pool.map(_evaluate_candidate, candidates):
+            results.append(result)
+            print(f"  candidate {len(results)}/{len(candidates)}: cv auc {result['cv_auc']:.4f} "
+                  f"({result['best_iteration']} trees)", file=sys.stderr)
+    return sorted(results, key=lambda result: -result['cv_auc'])
+
+
+def evaluate(model, X, y):
+    from sklearn.metrics import average_precision_score, roc_auc_score
+
+    probability = model.predict_proba(X)[:, 1]
+    return {'roc_auc': float(roc_auc_score(y, probability)), 'pr_auc': float(average_precision_score(y, probability))}
+
+
+def save_artifacts(output, model, scaler, route_stats, report):
+    """Write the model, scaler, route statistics, compiled ensemble and training report to output"""
+    from src.tree_model import export_model
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, 'best_model.pkl'), 'wb') as f:
+        pickle.dump(model, f)
+    with open(os.path.join(output, 'scaler.pkl'), 'wb') as f:
+        pickle.dump(scaler, f)
+    route_stats.save(os.path.join(output, 'route_stats.npy'))
+    export_model(model, scaler, os.path.join(output, 'best_model.npz'), source=os.path.join(output, 'best_model.pkl'))
+    with open(os.path.join(output, 'training_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the booking completion model")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--data', default=os.path.join(ROOT, 'data', 'preprocessed_data.csv'), help="labelled booking CSV")
+    source.add_argument('--store', help="labelled dataset store (see src.dataset_store)")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="artifact directory (default: model/candidate)")
+    parser.add_argument('--n-iter', type=int, default=40, help="search candidates")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--early-stopping', type=int, default=50, help="rounds without validation AUC gain")
+    parser.add_argument('--warm-start', metavar='MODEL_DIR', nargs='?', const=os.path.join(ROOT, 'model'),
+                        help="skip the search and continue boosting the model in MODEL_DIR on this data "
+                             "(pass a store holding old and new bookings so route statistics cover both)")
+    parser.add_argument('--extra-rounds', type=int, default=100, help="trees added when warm-starting")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help="recompute features and splits")
+    args = parser.parse_args(argv)
+
+    import lightgbm as lgb
+    from sklearn.preprocessing import StandardScaler
+
+    timings = {}
+    with stage(timings, 'load'):
+        bookings, data_key = load_bookings(args.data if args.store is None else None, args.store)
+    key = feature_key(data_key)
+    with stage(timings, 'features'):
+        X, y, route_stats, features_cached = build_features(bookings, args.cache_dir, key, not args.no_cache)
+    with stage(timings, 'splits'):
+        splits, splits_cached = build_splits(y, args.cache_dir, key, args.folds, not args.no_cache)
+    print(f"{len(y):,} bookings, {X.shape[1]} features (features {'cached' if features_cached else 'built'}, "
+          f"splits {'cached' if splits_cached else 'built'})", file=sys.stderr)
+
+    import pandas as pd
+
+    # The shipped model was fitted on a plain array and the scaler on named columns; keep both that way
+    columns = get_feature_columns()
+    train, test = splits['train'], splits['test']
+    X_train, y_train = np.asarray(X[train]), y[train]
+    X_test, y_test = np.asarray(X[test]), y[test]
+    params = base_params(y_train)
+    report = {'data_key': data_key, 'feature_key': key, 'rows': len(y), 'features': columns}
+
+    if args.warm_start:
+        with open(os.path.join(args.warm_start, 'best_model.pkl'), 'rb') as f:
+            previous = pickle.load(f)
+        with stage(timings, 'refit'):
+            model = lgb.LGBMClassifier(**{**previous.get_params(), 'n_estimators': args.extra_rounds})
+            model.fit(X_train, y_train, init_model=previous.booster_)
+        report['warm_start'] = {'from': os.path.abspath(args.warm_start), 'extra_rounds': args.extra_rounds,
+                                'previous_test': evaluate(previous, X_test, y_test)}
+    else:
+        with stage(timings, 'search'):
+            results = search(os.path.join(args.cache_dir, f'X-{key}.npy'), os.path.join(args.cache_dir, f'y-{key}.npy'),
+                             splits, args.folds, params, args.n_iter, args.workers, args.early_stopping)
+        best = results[0]
+        print(f"best cv auc {best['cv_auc']:.4f}: {best['params']}", file=sys.stderr)
+        with stage(timings, 'refit'):
+            model = lgb.LGBMClassifier(**params, **{**best['params'], 'n_estimators': best['best_iteration']})
+            model.fit(X_train, y_train)
+        report['search'] = results
+
+    with stage(timings, 'evaluate'):
+        report['test'] = evaluate(model, X_test, y_test)
+    print(f"test roc auc {report['test']['roc_auc']:.4f}, pr auc {report['test']['pr_auc']:.4f}", file=sys.stderr)
+
+    with stage(timings, 'save'):
+        # Fitted on the training split for models that need scaled features, as in the notebook
+        scaler = StandardScaler().fit(pd.DataFrame(X_train, columns=columns))
+        report['timings'] = timings
+        save_artifacts(args.output, model, scaler, route_stats, report)
+    print(f"Artifacts written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from src.dataset_store import file_sha256
+from src.scoring import CLASS_THRESHOLD
+
+COMPILED_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model', 'best_model.npz')
+
+# LightGBM missing-value handling per split
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+_ZERO_THRESHOLD = 1e-35
+
+# Rows evaluated together; bounds the (rows x trees) node-index working set
+ROW_BLOCK = 512
+
+
+def _flatten_trees(tree_info):
+    """Pack LightGBM's nested tree dump into flat node arrays shared by all trees
+
+    The two children of a split are stored next to each other, so the next node
+    is always ``left[node] + went_right``. Leaves point at themselves with an
+    infinite threshold, so rows that reached a leaf stay there.
+    """
+    nodes = []
+    roots = []
+    max_depth = 0
+    for tree in tree_info:
+        roots.append(len(nodes))
+        nodes.append(None)
+        stack = [(roots[-1], tree['tree_structure'], 0)]
+        while stack:
+            i, node, depth = stack.pop()
+            if 'leaf_value' in node:
+                nodes[i] = (-1, np.inf, i, node['leaf_value'], False, MISSING_NONE)
+                max_depth = max(max_depth, depth)
+                continue
+            if node['decision_type'] != '<=':
+                raise ValueError(f"Unsupported split type {node['decision_type']!r}; only numerical splits can be compiled")
+            left = len(nodes)
+            nodes.extend([None, None])
+            nodes[i] = (node['split_feature'], node['threshold'], left, node['internal_value'],
+                        node['default_left'], _MISSING_TYPES[node['missing_type']])
+            stack.append((left, node['left_child'], depth + 1))
+            stack.append((left + 1, node['right_child'], depth + 1))
+
+    feature, threshold, left, value, default_left, missing_type = zip(*nodes)
+    return {
+        'feature': np.array(feature, dtype=np.int32),
+        'threshold': np.array(threshold, dtype=np.float64),
+        'left': np.array(left, dtype=np.int32),
+        'value': np.array(value, dtype=np.float64),
+        'default_left': np.array(default_left, dtype=bool),
+        'missing_type': np.array(missing_type, dtype=np.int8),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': np.array(max_depth, dtype=np.int32),
+    }
+
+
+def binary_sigmoid(dump):
+    """Sigmoid scale of a binary LightGBM model dump"""
+    objective = dump['objective'].split()
+    if objective[0] != 'binary' or dump['num_tree_per_iteration'] != 1:
+        raise ValueError(f"Only binary LightGBM models can be compiled, got {dump['objective']!r}")
+    return float(dict(part.split(':') for part in objective[1:]).get('sigmoid', 1.0))
+
+
+class StaleCompiledModel(ValueError):
+    """The compiled ensemble was not exported from the pickled model next to it"""
+
+
+def export_model(model, scaler=None, path=COMPILED_MODEL_PATH, source=None):
+    """Flatten a fitted binary LGBMClassifier (and optional StandardScaler) into an .npz file
+
+    source is the pickle the model was loaded from; its sha256 is stored so
+    load_compiled can tell when the pickle has been replaced since.
+    """
+    dump = model.booster_.dump_model()
+    sigmoid = binary_sigmoid(dump)
+
+    arrays = _flatten_trees(dump['tree_info'])
+    arrays['sigmoid'] = np.array(sigmoid)
+    arrays['feature_names'] = np.array(dump['feature_names'])
+    if scaler is not None:
+        arrays['scaler_mean'] = np.asarray(scaler.mean_, dtype=np.float64)
+        arrays['scaler_scale'] = np.asarray(scaler.scale_, dtype=np.float64)
+    if source is not None:
+        arrays['source_sha256'] = np.array(file_sha256(source))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+class CompiledScaler:
+    """StandardScaler.transform from exported mean/scale arrays"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class CompiledEnsemble:
+    """Vectorized evaluator for an exported tree ensemble, walking all trees level by level"""
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.value = arrays['value']
+        self.default_left = arrays['default_left']
+        self.missing_type = arrays['missing_type']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.sigmoid = float(arrays['sigmoid'])
+        self.feature_names_in_ = arrays['feature_names']
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.classes_ = np.array([0, 1])
+        # Leaves keep the feature index of 0 so gathers stay in bounds
+        self._gather_feature = np.maximum(self.feature, 0)
+        self._only_missing_none = bool((self.missing_type == MISSING_NONE).all())
+
+    def _leaves(self, X):
+        """Leaf node index reached in every tree, shape (rows, trees)"""
+        n_rows, n_features = X.shape
+        nodes = np.repeat(self.roots[None, :], n_rows, axis=0)
+        row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        flat = X.ravel()
+        for _ in range(self.max_depth):
+            x = flat[row_offset + self._gather_feature[nodes]]
+            if self._only_missing_none:
+                went_right = x > self.threshold[nodes]
+            else:
+                missing_type = self.missing_type[nodes]
+                is_nan = np.isnan(x)
+                x = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, x)
+                missing = ((missing_type == MISSING_ZERO) & (np.abs(x) <= _ZERO_THRESHOLD)) | \
+                          ((missing_type == MISSING_NAN) & is_nan)
+                went_right = np.where(missing, ~self.default_left[nodes], x > self.threshold[nodes])
+                # Leaves must stay put whatever their (unused) missing handling says
+                went_right &= self.feature[nodes] >= 0
+            nodes = self.left[nodes] + went_right
+        return nodes
+
+    def _prepare(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected a 2-D array with {self.n_features_in_} features, got shape {X.shape}")
+        if self._only_missing_none and np.isnan(X).any():
+            # LightGBM treats NaN as 0 for splits without missing-value handling
+            X = np.nan_to_num(X, nan=0.0)
+        return X
+
+    def apply(self, X):
+        """Leaf node index reached in every tree, shape (rows, trees); callers bound the number of rows"""
+        return self._leaves(self._prepare(X))
+
+    def raw_score(self, X):
+        """Sum of leaf values over all trees"""
+        X = self._prepare(X)
+        raw = np.empty(len(X))
+        for start in range(0, len(X), ROW_BLOCK):
+            block = X[start:start + ROW_BLOCK]
+            raw[start:start + len(block)] = self.value[self._leaves(block)].sum(axis=1)
+        return raw
+
+    def score(self, X):
+        """Probability of completion and predicted class (at the calibrated CLASS_THRESHOLD) from a single pass"""
+        probability = 1.0 / (1.0 + np.exp(-self.sigmoid * self.raw_score(X)))
+        return probability, (probability > CLASS_THRESHOLD).astype(np.int64)
+
+    def predict_proba(self, X):
+        probability, _ = self.score(X)
+        return np.column_stack([1.0 - probability, probability])
+
+    def predict(self, X):
+        return self.score(X)[1]
+
+
+def load_compiled(path=COMPILED_MODEL_PATH, source=None):
+    """Load an exported ensemble and scaler without importing lightgbm or sklearn
+
+    With source, raise StaleCompiledModel unless the ensemble was exported from that pickle as it is now.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    if source is not None and os.path.exists(source):
+        if str(arrays.get('source_sha256', '')) != file_sha256(source):
+            raise StaleCompiledModel(f"{path} was not exported from the current {source} "
+                                     "(re-run python -m src.tree_model)")
+    scaler = None
+    if 'scaler_mean' in arrays:
+        scaler = CompiledScaler(arrays['scaler_mean'], arrays['scaler_scale'])
+    return CompiledEnsemble(arrays), scaler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export model/best_model.pkl to a compiled NumPy ensemble")
+    parser.add_argument('--model-dir', default=os.path.dirname(COMPILED_MODEL_PATH))
+    parser.add_argument('-o', '--output', default=COMPILED_MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    from src.scoring import load_model_and_scaler
+
+    model, scaler = load_model_and_scaler(args.model_dir)
+    export_model(model, scaler, args.output, source=os.path.join(args.model_dir, 'best_model.pkl'))
+    compiled, _ = load_compiled(args.output)
+    print(f"{len(compiled.roots)} trees, {len(compiled.feature)} nodes, depth {compiled.max_depth} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())